@@ -1,10 +1,12 @@
 import os
-import configparser
+import re
+import pickle
 import logging
 from enum import IntEnum, auto
 
 # Configuration of the product
 INI_FILENAME = 'philler.ini'
+CACHE_SUFFIX = '.cache'
 DEFAULT_PRODUCT = 'PRODUCT1'
 
 class CFG(IntEnum):
@@ -53,60 +55,104 @@ DEFAULT_ITEMS[DEFAULT_PRODUCT] = dict({
 })
 
 
+# Patterns for the INI parser, compiled once
+_SEC_RE = re.compile(r'^\s*\[([^\]]+)\]', re.M)
+# Keys can't start with a comment character, and the whitespace around '=' mustn't run on into the next line
+_KV_RE = re.compile(r'^[ \t]*([^=\s#;][^=\s]*)[ \t]*=[ \t]*(.*)$', re.M)
+
+class FastIni():
+    """
+    A minimal INI reader/writer.  Only handles sections of flat key = value scalars, which is all we store.
+    """
+
+    @staticmethod
+    def read(path):
+        """Read an INI file into a dict of sections, each a dict of string keys and values"""
+        with open(path, 'rb') as inifile:
+            text = inifile.read().decode()
+
+        data = dict()
+
+        # Slice the text up by section headers, and pull the keys/values out of each slice
+        headers = list(_SEC_RE.finditer(text))
+        for index, header in enumerate(headers):
+            end = headers[index + 1].start() if index + 1 < len(headers) else len(text)
+            section = data.setdefault(header.group(1).strip(), dict())
+            section.update((key.lower(), value.strip()) for key, value in _KV_RE.findall(text, header.end(), end))
+
+        return data
+
+    @staticmethod
+    def write(path, data):
+        """Write a dict of sections to an INI file, replacing it atomically"""
+        lines = list()
+        for name, section in data.items():
+            lines.append(f'[{name}]')
+            lines.extend(f'{key} = {value}' for key, value in section.items())
+            lines.append('')
+
+        # Build the whole file up front, so it goes out in a single write
+        blob = memoryview(('\n'.join(lines) + '\n').encode())
+
+        # Write to a temp file and swap it in, so a crash never leaves a partial INI file
+        temp = path + '.tmp'
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while blob:
+                blob = blob[os.write(fd, blob):]
+
+            # Get the data onto the SD card before the rename, or a power cut can leave an empty INI file
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        os.replace(temp, path)
+
+
 class Configuration():
 
     class ConfigurableItem():
         """A single configurable item"""
+        __slots__ = ('displayname', 'units', 'configname', '_value', 'itemtype', '_changed')
+
         def __init__(self, displayname, units, configname, value, itemtype):
-            self._displayname = displayname
-            self._units = units
-            self._configname = configname
+            self.displayname = displayname
+            self.units = units
+            self.configname = configname
             self._value = value
-            self._itemtype = itemtype
+            self.itemtype = itemtype
 
             self._changed = False
 
-        @property
-        def displayname(self): return self._displayname
-
-        @property
-        def units(self): return self._units
-
-        @property
-        def configname(self): return self._configname
-
         @property
         def value(self): return self._value
         @value.setter
         def value(self, val):
-            self._value = val
-            self._changed = True
-
-        @property
-        def itemtype(self): return self._itemtype
+            if val != self._value:
+                self._value = val
+                self._changed = True
 
         @property
         def changed(self): return self._changed
 
-    # Singleton instantiation
-    _instance = None
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            cls._instance = super(Configuration, cls).__new__(cls, *args, **kwargs)
-        return cls._instance
+        def clearChanged(self):
+            """Acknowledge that the value has been saved"""
+            self._changed = False
 
     def __init__(self):
         self.log = logging.getLogger('')
 
-        self.config = None
+        self.data = None
         self.product = None
-        self.configurableItems = dict()
+
+        # Items are indexed by their CFG value, which is a small integer
+        self.configurableItems = [None] * (max(CFG) + 1)
 
     @property
     def changed(self):
         """Determine if any config items have changed"""
         result = False
-        for item in self.configurableItems.values():
+        for item in filter(None, self.configurableItems):
             if item.changed:
                 result = True
 
@@ -115,45 +161,45 @@ class Configuration():
     def load(self, filename, product):
         """Load the INI file from disk"""
         self.filename = filename
+        self.cachename = filename + CACHE_SUFFIX
         self.product = product
 
-        if self.config is None:
-            self.config = configparser.ConfigParser()
-            self.config.add_section(product)
-
-            # Make a second config parser to detect that we have new items to save
-            self.configCheck = configparser.ConfigParser()
-            self.configCheck.add_section(product)
+        if self.data is None:
+            self.data = dict()
 
-        # Load the config with the defaults, before overwriting with what's in the ini file
+        # Load the section with the defaults, before overwriting with what's in the ini file
+        section = self.data.setdefault(product, dict())
         for configurable, values in DEFAULT_ITEMS[product].items():
 
             # Break out the configurable properties
             displayname, units, configname, itemtype, defaultvalue = values
 
-            # Assign the properties to the dict inside the configparser
-            self.config[product][configname] = f'{defaultvalue}'
+            section[configname] = f'{defaultvalue}'
 
         # Create a new INI file if needed
         if not os.path.exists(filename):
             self.log.info(f'Creating a new config file: {filename}')
-            self.save()
+            self.save(force=True)
+
+        # Skip parsing if the cached copy is current with the file on disk
+        elif self.readCache(product):
+            self.log.debug(f'Loaded config from cache: {self.cachename}')
+
         else:
-            self.config.read(filename)
-            self.configCheck.read(filename)
-
-        # Iterate the entries in the file on disk and determine if we have new ones that need saving
-        needsSaving = False
-        for item, value in self.config[product].items():
-            try:
-                self.configCheck[product][item]
-            except KeyError:
+            ondisk = FastIni.read(filename)
+            for name, items in ondisk.items():
+                self.data.setdefault(name, dict()).update(items)
+
+            # Determine if we have defaults that are not in the file on disk yet, and need saving
+            newItems = section.keys() - ondisk.get(product, dict()).keys()
+            for item in sorted(newItems):
                 self.log.debug(f'New INI item detected: {item}')
-                needsSaving = True
 
-        if needsSaving:
-            self.log.info(f'INI file has new entries and needs saving.')
-            self.save()
+            if newItems:
+                self.log.info(f'INI file has new entries and needs saving.')
+                self.save(force=True)
+            else:
+                self.writeCache()
 
         # Build the items dictionary
         for configurable, values in DEFAULT_ITEMS[product].items():
@@ -162,33 +208,96 @@ class Configuration():
             displayname, units, configname, itemtype, defaultvalue = values
 
             # Create an item instance with the properly typed value
-            self.configurableItems[configurable] = self.ConfigurableItem(displayname, units, configname, itemtype(self.config[product][configname]), itemtype)
+            self.configurableItems[configurable] = self.ConfigurableItem(displayname, units, configname, itemtype(section[configname]), itemtype)
+
+    def save(self, force=False):
+        """Save the INI file to disk, if anything changed (or if forced)"""
 
-    def save(self):
-        """Save the INI file to disk"""
+        # Nothing to write if no item has changed since the last save
+        if not force and not self.changed:
+            return
 
         # Sync the items to their configs, then save
-        for configurable, item in self.configurableItems.items():
+        for item in filter(None, self.configurableItems):
 
-            # Update the config instance with any new values
-            self.config[self.product][item.configname] = f'{item.value}'
+            # Acknowledge the change before taking the value, so a set() from another thread after this point keeps
+            # its item flagged for the next save instead of being cleared unwritten
+            item.clearChanged()
 
-        with open(self.filename, 'w') as configfile:
-            self.log.info(f'Saving config file to {self.filename}')
-            self.config.write(configfile)
+            # Update the config data with any new values
+            self.data[self.product][item.configname] = f'{item.value}'
 
-    def get(self, configurable):
-        """Get a configurable value with its properties"""
+        self.log.info(f'Saving config file to {self.filename}')
+        FastIni.write(self.filename, self.data)
+
+        # Keep the cache in step with the file we just wrote
+        self.writeCache()
+
+    def readCache(self, product):
+        """Load the parsed INI data from the cache file, if it matches the INI file's modification time and size"""
+        try:
+            with open(self.cachename, 'rb') as cachefile:
+                key, data = pickle.load(cachefile)
+
+            if key != self.cacheKey():
+                return False
+
+        except Exception as e:
+            self.log.debug(f'Config cache not usable: {e}')
+            return False
+
+        # A cache missing any of the defaults is stale, so let the INI file be parsed and updated instead
+        if self.data[product].keys() - data.get(product, dict()).keys():
+            return False
+
+        for name, items in data.items():
+            self.data.setdefault(name, dict()).update(items)
+
+        return True
+
+    def cacheKey(self):
+        """
+        Identify the version of the INI file on disk that the cache was made from.  The size is included, as coarse
+        timestamps (e.g. FAT on an SD card) can leave a hand edit with the same modification time.
+        """
+        stat = os.stat(self.filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    def writeCache(self):
+        """Save the parsed INI data next to the INI file, keyed by the INI file's modification time and size"""
+        temp = self.cachename + '.tmp'
         try:
-            # Verify we have an item for the desired configurable value
-            item = self.configurableItems[configurable]
+            with open(temp, 'wb', buffering=1024*1024) as cachefile:
+                pickle.dump((self.cacheKey(), self.data), cachefile, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # Swap it in atomically, so a reader never sees a partial cache
+            os.replace(temp, self.cachename)
 
-            return item.value, item.units, item.displayname, item.itemtype
+        except OSError as e:
+            self.log.warning(f'Unable to write config cache {self.cachename}: {e}')
 
-        except KeyError:
+    def getItem(self, configurable):
+        """Look up the item for a configurable, or None if there isn't one"""
+        try:
+            # Negative indexes would wrap around to a real item, so they're as invalid as ones past the end
+            if configurable < 0:
+                return None
+
+            return self.configurableItems[configurable]
+        except (IndexError, TypeError):
+            return None
+
+    def get(self, configurable):
+        """Get a configurable value with its properties"""
+
+        # Verify we have an item for the desired configurable value
+        item = self.getItem(configurable)
+        if item is None:
             # Return something sane, but not useful
             return 0.0, 'inv', '(invalid)', float
 
+        return item.value, item.units, item.displayname, item.itemtype
+
     def getValue(self, configurable):
         """Get just the value"""
         val, _, _, _ = self.get(configurable)
@@ -197,24 +306,24 @@ class Configuration():
     def set(self, configurable, value, save=True):
         """Get a configurable value with its properties"""
 
-        try:
-            # Verify we have an item for the desired configurable value
-            item = self.configurableItems[configurable]
-            oldvalue = item.value
-            item.value = value
+        # Verify we have an item for the desired configurable value
+        item = self.getItem(configurable)
+        if item is None:
+            return False
 
+        # Only record a change if the value is actually different
+        oldvalue = item.value
+        if value != oldvalue:
+            item.value = value
             self.log.info(f'Changed configurable {configurable}/{item.configname} from {oldvalue} to {value}')
 
-        except KeyError:
-            return False
-
         # Typically we save it to a file unless directed otherwise
         if save:
             self.save()
 
 
 # -------------------------------------------------------------------------
-# Create a single instance of the configuration for global usage
+# Create a single instance of the configuration for global usage.  Import this rather than making a new one.
 log = logging.getLogger('')
 log.info(f'Loading configuration for {DEFAULT_PRODUCT} from {INI_FILENAME}')
 config = Configuration()
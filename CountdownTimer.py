@@ -1,6 +1,9 @@
 import time
 import datetime
 
+# Nanoseconds in a microsecond, the resolution of a timedelta
+NS_PER_US = 1000
+
 class CountdownTimer:
     """
     Define a timer that counts down.  Resolution in seconds.
@@ -13,8 +16,9 @@ class CountdownTimer:
         :return: Nothing.
         """
         self.timedelta = datetime.timedelta(milliseconds=milliseconds, seconds=seconds, minutes=minutes, hours=hours)
+        self.duration = (self.timedelta // datetime.timedelta(microseconds=1)) * NS_PER_US
         self.tstart = self.now
-        self.tend = self.tstart + self.timedelta
+        self.tend = self.tstart + self.duration
 
     def restart(self):
         """
@@ -23,13 +27,15 @@ class CountdownTimer:
         :return: Nothing.
         """
         self.tstart = self.now
-        self.tend = self.tstart + self.timedelta
+        self.tend = self.tstart + self.duration
 
     @property
-    def now(self): return datetime.datetime.today()
+    def now(self):
+        """Monotonic clock in nanoseconds, so timers are immune to wall clock changes"""
+        return time.monotonic_ns()
 
     @property
-    def expired(self): return self.now >= self.tend
+    def expired(self): return time.monotonic_ns() >= self.tend
 
     def expire(self):
         """
@@ -42,5 +48,4 @@ class CountdownTimer:
     @property
     def remaining(self):
         """Determine how much time is remaining on the timer, in milliseconds"""
-        return (self.tend - self.now).total_seconds() * 1000
-
+        return (self.tend - self.now) / 1e6
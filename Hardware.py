@@ -2,10 +2,8 @@ import os
 import time
 import logging
 import serial
-import traceback
 from threading import Lock, Event
-from queue import SimpleQueue
-import re
+from collections import deque, namedtuple
 from enum import auto, IntEnum
 from CountdownTimer import CountdownTimer
 
@@ -13,15 +11,113 @@ from PyQt5.QtCore import Qt, QSize, QTimer, QObject, QThread, pyqtSignal
 
 log = logging.getLogger('')
 
+# Frames are under 40 bytes, so never read a line longer than this
+MAX_FRAME_LENGTH = 64
+
+# Size of the serial receive buffer to request, on platforms that allow it
+RX_BUFFER_SIZE = 8192
+
+# Longest time between status updates, even when nothing has changed, so listeners can tell the thread is alive (s)
+STATUS_HEARTBEAT = 0.25
+
+# Serial devices to look for, in order of preference (ACM0 for real system, USB0 for dev VM)
+SERIAL_DEVICES = ('/dev/ttyACM0', '/dev/ttyUSB0')
+
+# A consistent set of the values displayed by the GUI, taken on the device thread and sent to the GUI thread
+FillerStatus = namedtuple('FillerStatus', 'connected weight pressure fillswitch stopswitch pressureSwitch dispenseSwitch')
+
+# -------------------------------------------------------------------------
+def findSerialPort(candidates=SERIAL_DEVICES):
+    """
+    Find the first serial device present, listing each device directory only once.
+
+    :param candidates: Device paths to look for, in order of preference.
+    :return: The path of the device found.
+    """
+    listings = dict()
+    for device in candidates:
+        directory, name = os.path.split(device)
+        if directory not in listings:
+            try:
+                listings[directory] = set(os.listdir(directory))
+            except OSError:
+                listings[directory] = set()
+
+        if name in listings[directory]:
+            return device
+
+    raise Exception(f'Serial device not detected! Looked for: {", ".join(candidates)}')
+
+# -------------------------------------------------------------------------
+def calculatePSIConversion():
+    """
+    Calculate the PSI slope/intercept from A to D counts.
+
+    Pressure is provided as a voltage across a resistor converted to A to D counts.
+
+    :return: Tuple of (PSI per count, PSI intercept).
+    """
+
+    # (measured empirically)
+    # Resistor             = 216 ohm
+    R = 216
+
+    # (default value, could be measured)
+    # Reference voltage    = 5 V
+    Vref = 5.0
+
+    # A to D range         = 10 bits = 1024 counts
+    adRange = 2 ** 10
+
+    # A to D counts / volt = AtoD (1023) / Vref (5) = 204.8
+    countsPerVolt = adRange / Vref
+
+    # (measured empirically)
+    # Current at 0psi      = 0.004 A
+    # Current at 30psi     = 0.020 A
+    I0psi = 0.004
+    I30psi = 0.020
+
+    # Voltage at 0psi      = 0.004A * 216 = 0.86V
+    # Voltage at 30psi     = 0.020A * 216 = 4.32V
+    V0psi = I0psi * R
+    V30psi = I30psi * R
+
+    # AtoD counts at 0psi  = 0.86V * 204.8 = 177 counts
+    # AtoD counts at 30psi = 4.32V * 204.8 = 885 counts
+    C0psi = V0psi * countsPerVolt
+    C30psi = V30psi * countsPerVolt
+
+    # PSI / count          = ((30-0) / (885-177)) = 0.0424 psi/count
+    PSIperCount = (30-0) / (C30psi - C0psi)
+
+    # x1, y1 = 177 counts, 0 psi
+    # y - y1 = m(x - x1)
+    # y - 0  = m(x - 177)
+    # y      = mx - (m*177)
+    # PSI at 0 counts = 0 -(0.0424 * 177) = -7.5 psi
+    PSIintercept = -(PSIperCount * C0psi)
+
+    return PSIperCount, PSIintercept
+
+# The conversion is fixed by the hardware, so only work it out once
+PSI_PER_COUNT, PSI_INTERCEPT = calculatePSIConversion()
+
 class Filler(QObject):
 
     finished = pyqtSignal()
 
+    # Emitted with a FillerStatus whenever one of the displayed values changes
+    statusUpdated = pyqtSignal(object)
+
     # -------------------------------------------------------------------------
     def __init__(self, simulate=False, *args, **kwargs):
 
         QObject.__init__(self, *args, **kwargs)
 
+        # Detect which comm device is connected, before setting anything else up
+        self.port = findSerialPort()
+
         # Flag to indicate we are in a simulation mode
         self.simulate = simulate
         self.simulatedPressure = 0.0
@@ -30,37 +126,35 @@ class Filler(QObject):
         self.simulatedStopswitch = False
         self.simulatedStable = False
 
-        # Conversion factors
-        self.PSIperCount = None
-        self.PSIintercept = None
-
         # Serial interface
         self.ser = None
-
-        # Detect which comm device is connected (ACM0 for real system, USB0 for dev VM)
-        device1 = '/dev/ttyACM0'
-        device2 = '/dev/ttyUSB0'
-        if os.path.exists(device1):
-            self.port = device1
-        elif os.path.exists(device2):
-            self.port = device2
-        else:
-            raise Exception('Serial device not detected!')
+        self.rxTail = b'' # Partial line left over from the last read
 
         self.baudrate = 19200
-        self.lastmessage = 0
+        self.lastmessage = 0 # time.monotonic() of the last data received
 
         # Interface to callers
-        self.requests = SimpleQueue()
+        self.requests = deque(maxlen=1) # Only the latest request is kept, append/popleft are atomic across threads
+        self.abortRequested = False # An abort is flagged separately, so it can't be replaced or queued behind a task
         self._weight = 0.0
-        self._weights = list()
         self.maxweights = 30 # Use the last 30 values in the calculation
+        self._weights = deque(maxlen=self.maxweights)
+
+        # Monotonic deques of (sample number, weight) tracking the min/max over the window of weights
+        self._weightCount = 0
+        self._weightsMin = deque()
+        self._weightsMax = deque()
+
         self._stopswitch = False
         self._fillswitch = False
         self._fillswitchLatched = False
         self.pressureRaw = 0
         self._pressureswitch = False
 
+        # The last FillerStatus sent out, and the time.monotonic() it was sent
+        self.lastStatus = None
+        self.lastStatusTime = 0
+
         # A timer to estimate when a dispense is done
         self.dispenseTimer = CountdownTimer()
         self.dispenseTimer.expire()
@@ -75,82 +169,56 @@ class Filler(QObject):
     def countsToPSI(self, counts):
         """Convert A to D counts into a PSI value """
 
-        # Pressure is provided as a voltage across a resistor converted to A to D counts.
-
-        # Calculate the PSI slope/intercept from A to D counts
-        if self.PSIperCount is None:
-
-            # (measured empirically)
-            # Resistor             = 216 ohm
-            R = 216
-
-            # (default value, could be measured)
-            # Reference voltage    = 5 V
-            Vref = 5.0
-
-            # A to D range         = 10 bits = 1024 counts
-            adRange = 2 ** 10
-
-            # A to D counts / volt = AtoD (1023) / Vref (5) = 204.8
-            countsPerVolt = adRange / Vref
-
-            # (measured empirically)
-            # Current at 0psi      = 0.004 A
-            # Current at 30psi     = 0.020 A
-            I0psi = 0.004
-            I30psi = 0.020
-
-            # Voltage at 0psi      = 0.004A * 216 = 0.86V
-            # Voltage at 30psi     = 0.020A * 216 = 4.32V
-            V0psi = I0psi * R
-            V30psi = I30psi * R
-
-            # AtoD counts at 0psi  = 0.86V * 204.8 = 177 counts
-            # AtoD counts at 30psi = 4.32V * 204.8 = 885 counts
-            C0psi = V0psi * countsPerVolt
-            C30psi = V30psi * countsPerVolt
-
-            # PSI / count          = ((30-0) / (885-177)) = 0.0424 psi/count
-            self.PSIperCount = (30-0) / (C30psi - C0psi)
-
-            # x1, y1 = 177 counts, 0 psi
-            # y - y1 = m(x - x1)
-            # y - 0  = m(x - 177)
-            # y      = mx - (m*177)
-            # PSI at 0 counts = 0 -(0.0424 * 177) = -7.5 psi
-            self.PSIintercept = -(self.PSIperCount * C0psi)
-
         # Counts to PSI equation:
         #
         # PSI = (0.0424 psi/count) * count + (-7.5 psi)
-        psi = self.PSIperCount * counts + self.PSIintercept
-
-        return psi
+        return PSI_PER_COUNT * counts + PSI_INTERCEPT
 
     # -------------------------------------------------------------------------
     @property
     def connected(self):
         # If we have received a message in the last second, we are "connected"
-        now = time.time()
+        now = time.monotonic()
         return (now - self.lastmessage < 1)
 
+    # Single values are read and written without the lock, as loads/stores of one attribute are atomic under the
+    # GIL.  The lock only guards compound state: the weights window and the fill switch latch.
     @property
     def weight(self):
         if self.simulate:
             return self.simulatedWeight
 
-        with self.lock:
-            return self._weight
+        return self._weight
 
     @weight.setter
     def weight(self, val):
         with self.lock:
-            self._weight = val
-            self._weights.append(val)
+            self.addWeight(val)
+
+    def addWeight(self, val):
+        """Record a new weight in the window of recent weights.  Call with the lock held."""
+        self._weight = val
+
+        # The deque discards the oldest weight once it holds the last 30
+        self._weights.append(val)
+
+        # Samples numbered at or below this have left the window
+        count = self._weightCount
+        self._weightCount += 1
+        expired = count - self.maxweights
+
+        # Keep the minimums ascending and the maximums descending, so the extremes are always at the front
+        while self._weightsMin and self._weightsMin[-1][1] >= val:
+            self._weightsMin.pop()
+        self._weightsMin.append((count, val))
+        if self._weightsMin[0][0] <= expired:
+            self._weightsMin.popleft()
 
-            # Trim the array to the last 30 weights
-            while len(self._weights) > self.maxweights:
-                self._weights = self._weights[1:]
+        while self._weightsMax and self._weightsMax[-1][1] <= val:
+            self._weightsMax.pop()
+        self._weightsMax.append((count, val))
+        if self._weightsMax[0][0] <= expired:
+            self._weightsMax.popleft()
 
     @property
     def stable(self):
@@ -162,31 +230,28 @@ class Filler(QObject):
             # Once we have enough values to work with...
             if len(self._weights) > 2:
 
-                # The weight value is stable if the last 10 vals are within 0.1g of the most recent value
+                # The weight value is stable if all the recent values are within 0.1g of the most recent value
                 latest = self._weights[-1]
 
-                for val in self._weights[:-1]:
-                    if val > (latest + 0.1):
-                        return False
-                    if val < (latest - 0.1):
-                        return False
+                if self._weightsMax[0][1] > (latest + 0.1):
+                    return False
+                if self._weightsMin[0][1] < (latest - 0.1):
+                    return False
 
             return True
 
     @property
     def fillswitch(self):
-        with self.lock:
-            return self._fillswitch
+        return self._fillswitch
     @fillswitch.setter
     def fillswitch(self, val):
-        with self.lock: self._fillswitch = val
+        self._fillswitch = val
 
     @property
     def fillswitchLatched(self):
         if self.simulate:
             return self.simulatedFillswitchLatched
-        with self.lock:
-            return self._fillswitchLatched
+        return self._fillswitchLatched
 
     @fillswitchLatched.setter
     def fillswitchLatched(self, val):
@@ -198,28 +263,19 @@ class Filler(QObject):
     def stopswitch(self):
         if self.simulate:
             return self.simulatedStopswitch
-        with self.lock:
-            return self._stopswitch
+        return self._stopswitch
     @stopswitch.setter
     def stopswitch(self, val):
-        with self.lock: self._stopswitch = val
+        self._stopswitch = val
 
     @property
     def pressure(self):
         if self.simulate:
             return self.simulatedPressure
 
-        # Convert the raw pressure value into PSI
-        with self.lock:
-            p = self.pressureRaw
-
-            # Clip the pressure at minimum/maximum
-            if p > 1023:
-                p = 1023
-            if p < 0:
-                p = 0
-
-            return self.countsToPSI(p)
+        # Clip the pressure at minimum/maximum, and convert the raw pressure value into PSI
+        p = min(1023, max(0, self.pressureRaw))
+        return PSI_PER_COUNT * p + PSI_INTERCEPT
 
     @property
     def pressureSwitch(self):
@@ -272,24 +328,86 @@ class Filler(QObject):
         VENT       = auto()
         DISPENSE   = auto()
 
+    # Commands sent to the Arduino, each terminated with an underscore
+    CMD_PRESSURIZE = b'P_'
+    CMD_VENT       = b'p_'
+    CMD_ABORT      = b'0_'
+    CMD_DISPENSE   = b'%d_' # Dispense time in ms
+
+    # Switch states in a data frame, upper case is on
+    BYTE_S = ord('S')
+    BYTE_F = ord('F')
+
     def request(self, task, param=None):
-        """Create a request event to the filler I/O"""
-        if task in self.TASKS:
-            self.requests.put((task,param), block=False)
+        """Create a request event to the filler I/O, replacing any request not yet sent"""
+        if task == self.TASKS.ABORT:
+
+            # Cancel a dispense that's still waiting to be sent, leaving any other task in place.  Only the caller's
+            # thread adds requests, so nothing can be replaced while the pending one is briefly out of the deque.
+            try:
+                pending = self.requests.popleft()
+                if pending[0] != self.TASKS.DISPENSE:
+                    self.requests.appendleft(pending)
+            except IndexError:
+                pass
+
+            self.abortRequested = True
+        elif isinstance(task, self.TASKS):
+            self.requests.append((task, param))
         else:
             log.critical(f'Unknown task requested of filler hardware: {task}')
 
     def getRequest(self):
-        """Get the most recent request"""
-        if not self.requests.empty():
-            task, param = self.requests.get(block=False, timeout=0)
-        else:
-            task = None
-            param = None
-
-        return task, param
+        """Get the pending request"""
+        try:
+            return self.requests.popleft()
+        except IndexError:
+            return None, None
 
     # -------------------------------------------------------------------------
+    def applyFrame(self, weight, pressureRaw, stopswitch, fillswitch, fillswitchPressed):
+        """
+        Update all the values decoded from the serial data, under a single acquisition of the lock.
+
+        :param fillswitch: Fill switch state in the latest frame.
+        :param fillswitchPressed: True if the fill switch was on in any frame since the last update.
+        :return: Nothing.
+        """
+        with self.lock:
+            self.addWeight(weight)
+            self.pressureRaw = pressureRaw
+            self._stopswitch = stopswitch
+            self._fillswitch = fillswitch
+
+            # Latch the fill switch (crude debounce)
+            latched = self.simulatedFillswitchLatched if self.simulate else self._fillswitchLatched
+            if not latched:
+                self._fillswitchLatched = fillswitchPressed
+                self.simulatedFillswitchLatched = fillswitchPressed
+
+    @staticmethod
+    def parseFrame(s):
+        """
+        Split a data frame from the Arduino into its fields.
+
+        :param s: The raw bytes of the frame, e.g. b"+    0.00g  ;194;s;f"
+        :return: Tuple of (signed weight, pressure) bytes and (stop switch, fill switch) byte values, or None if it
+                 can't be parsed.
+        """
+
+        # The frame is fixed structure, so splitting on the separators is all it takes
+        parts = s.rstrip().split(b';')
+        if len(parts) != 4:
+            return None
+
+        weightStr = parts[0].rstrip()
+        if weightStr.endswith(b'g') and parts[2] in (b's', b'S') and parts[3] in (b'f', b'F'):
+
+            # The sign is padded away from the digits with spaces
+            return weightStr[:-1].replace(b' ', b''), parts[1], parts[2][0], parts[3][0]
+
+        return None
+
     def read(self):
         """Read from the serial port and parse the fields out"""
         if self.ser is None:
@@ -298,52 +416,76 @@ class Filler(QObject):
             except serial.SerialException:
                 return
 
-        # Read a line from the Arduino
-        s = self.ser.readline()
+            # Enlarge the driver's receive buffer (only supported on some platforms)
+            if hasattr(self.ser, 'set_buffer_size'):
+                self.ser.set_buffer_size(rx_size=RX_BUFFER_SIZE)
+
+        # Drain everything waiting on the port, or wait briefly for a line if nothing is
+        pending = self.ser.in_waiting
+        data = self.ser.read(pending) if pending else self.ser.readline(MAX_FRAME_LENGTH)
+
+        if len(data) > 0:
+            self.lastmessage = time.monotonic()
+
+            # Split into lines, keeping any partial line to complete on the next read
+            lines = (self.rxTail + data).split(b'\n')
+            self.rxTail = lines.pop()
 
-        if len(s) > 0:
-            self.lastmessage = time.time()
+            # Drop a partial line that has grown too long to ever be a frame
+            if len(self.rxTail) > MAX_FRAME_LENGTH:
+                log.critical(f'Discarding unterminated data: {self.rxTail}')
+                self.rxTail = b''
 
-            # Data Format example:  "+    0.00g  ;194;s;f"
-            match = re.match('([-+ ]*)\s*(\d+\.\d+)g\s*;(\d+);([sS]);([fF])', s.decode('UTF-8'))
-            if match:
-                posneg = match.groups()[0].strip()
-                weightStr = match.groups()[1]
-                pressureStr = match.groups()[2]
-                stopswitchStr = match.groups()[3]
-                fillswitchStr = match.groups()[4]
+            # Only the latest frame's values matter, but a fill switch press in any frame must still latch
+            fields = None
+            fillswitchPressed = False
+            for line in lines:
+                if not line.strip():
+                    continue
+
+                # Data Format example:  "+    0.00g  ;194;s;f"
+                lineFields = self.parseFrame(line)
+                if lineFields is None:
+                    log.critical(f'Unable to parse string: {line}')
+                    continue
+
+                fields = lineFields
+                fillswitchPressed = fillswitchPressed or (fields[3] == self.BYTE_F)
+
+            if fields is not None:
+                weightStr, pressureStr, stopswitchByte, fillswitchByte = fields
 
                 # Decode the weight
                 try:
-                    self.weight = float(posneg + weightStr)
+                    weight = float(weightStr)
                 except ValueError as e:
-                    log.critical(f'Unable to format weight strings: "{posneg}" "{weightStr}"')
-                    self.weight = -99.99
+                    log.critical(f'Unable to format weight string: "{weightStr}"')
+                    weight = -99.99
 
                 # Decode the pressure
                 try:
-                    self.pressureRaw = int(pressureStr)
+                    pressureRaw = int(pressureStr)
                 except ValueError as e:
                     log.critical(f'Unable to format pressure string: "{pressureStr}"')
-                    self.pressureRaw = 0
-
-                # Decode the stop switch value
-                self.stopswitch = (stopswitchStr == 'S')
-
-                # Decode the fill switch value
-                self.fillswitch = (fillswitchStr == 'F')
+                    pressureRaw = 0
 
-                # Latch the fill switch (crude debounce)
-                if self.fillswitchLatched == False:
-                    self.fillswitchLatched = self.fillswitch
-
-            else:
-                log.critical(f'Unable to parse string: {s}')
+                # Decode the switch values, and update everything at once
+                self.applyFrame(weight, pressureRaw, stopswitchByte == self.BYTE_S, fillswitchByte == self.BYTE_F,
+                                fillswitchPressed)
 
         else:
             #log.info('Empty read from serial port!')
             pass
 
+        # An abort goes out first.  It's checked before taking the pending request, so anything taken below was
+        # requested after the abort, or was taken before the abort was flagged and gets aborted on the next read.
+        if self.abortRequested:
+            self.abortRequested = False
+
+            # Zero out the dispense time to force it to stop
+            log.critical('SENDING ABORT')
+            self.ser.write(self.CMD_ABORT)
+
         # See if there's a request to send to the arduino
         task, param = self.getRequest()
         if task is not None:
@@ -351,31 +493,41 @@ class Filler(QObject):
             if task == self.TASKS.PRESSURIZE:
                 # Send the valve state to pressurize the bulk
                 log.critical('SENDING PRESSURIZE')
-                self.ser.write(f'P_'.encode('UTF-8'))
+                self.ser.write(self.CMD_PRESSURIZE)
                 self._pressureswitch = True
 
             elif task == self.TASKS.VENT:
                 # Send the valve state to de-pressurize the bulk
                 log.critical('SENDING DE-PRESSURIZE')
-                self.ser.write(f'p_'.encode('UTF-8'))
+                self.ser.write(self.CMD_VENT)
                 self._pressureswitch = False
 
             elif task == self.TASKS.DISPENSE:
                 # Send a dispense down to the filler hardware
                 log.critical(f'SENDING DISPENSE FOR {param}ms')
-                self.ser.write(f'{param}_'.encode('UTF-8'))
+                self.ser.write(self.CMD_DISPENSE % param)
                 self.dispenseTimer.start(milliseconds=param)
 
-            elif task == self.TASKS.ABORT:
-                # Zero out the dispense time to force it to stop
-                log.critical('SENDING ABORT')
-                self.ser.write(f'0_'.encode('UTF-8'))
 
+    # -------------------------------------------------------------------------
+    def status(self):
+        """Take a snapshot of the values displayed by the GUI"""
+        return FillerStatus(self.connected, self.weight, self.pressure, self.fillswitch, self.stopswitch,
+                            self.pressureSwitch, self.dispenseSwitch)
+
+    def sendStatus(self):
+        """Send the status to any listeners, if it has changed since the last time or the heartbeat is due"""
+        status = self.status()
+        now = time.monotonic()
+        if status != self.lastStatus or (now - self.lastStatusTime) >= STATUS_HEARTBEAT:
+            self.lastStatus = status
+            self.lastStatusTime = now
+            self.statusUpdated.emit(status)
 
     # -------------------------------------------------------------------------
     @property
     def stopping(self):
-        return self._stop.isSet()
+        return self._stop.is_set()
 
     def stop(self):
         self._stop.set()
@@ -387,17 +539,23 @@ class Filler(QObject):
         """
         log.debug('Device thread running.')
 
-        hb = 0
-
-        prev = 0
-        while not self._stop.wait(self.tickrate):
+        monotonic = time.monotonic
+        wait = self._stop.wait
+        lastError = None
+        while not wait(self.tickrate):
             try:
                 # Run the hardware interface
                 self.read()
 
             except Exception as e:
-                log.critical(f'Exception during processing: {e}')
-                log.critical(traceback.print_tb(e.__traceback__))
+                # Only log once a second, so a persistent failure doesn't flood the log at the tick rate
+                now = monotonic()
+                if lastError is None or (now - lastError) >= 1:
+                    log.exception(f'Exception during processing: {e}')
+                    lastError = now
+
+            # Send the status even when the read failed, so the GUI sees the device drop out (e.g. unplugged)
+            self.sendStatus()
 
         self.ser.close()
 
@@ -14,6 +14,7 @@ class Sequencer(QObject):
     """
     finished = pyqtSignal()
     heartbeat = pyqtSignal(int)
+    stateChanged = pyqtSignal(int) # Emitted with the new state's value after a tick that changed state
 
     def __init__(self, *args, **kwargs):
 
@@ -21,9 +22,12 @@ class Sequencer(QObject):
 
         self.state = None
         self.statemethods = dict()
+        self.stateList = tuple()
+        self.statemethodList = list()
 
         # Task properties
         self.tickrate = 0.1
+        self.heartbeatInterval = 16 # Only emit the heartbeat every Nth tick
         self._stop = Event()
         self._stop.clear()
 
@@ -53,14 +57,19 @@ class Sequencer(QObject):
                 self.critical(f'Model is not fully implemented, missing a process_{state._name_}() method!')
                 exit(1)
 
+        # The states are numbered contiguously from 0, so map values to states and methods with lists rather than
+        # hashing or coercing the enum every tick
+        self.stateList = tuple(sorted(self._states, key=lambda s: s.value))
+        self.statemethodList = [self.statemethods[state] for state in self.stateList]
+
         # Hook the state transitions to methods in the model
         transitions = [dict(trigger='run', source=x, dest=None, conditions='_procstate') for x in self._states]
 
         # Create a transitions state machine from our model, enter at the 0th state
-        self.machine = Machine(self, states=self._states, transitions=transitions, initial=self._states(0))
+        self.machine = Machine(self, states=self._states, transitions=transitions, initial=self.stateList[0])
 
     @property
-    def terminated(self): return self.state == self._states(len(self._states)-1) # The terminal state is the last in the enum
+    def terminated(self): return self.state == self.stateList[-1] # The terminal state is the last in the enum
 
     @property
     def stateName(self): return self.state.name
@@ -73,7 +82,7 @@ class Sequencer(QObject):
         """
         old = self.state.name
         try:
-            self.statemethods[self.state]()
+            self.statemethodList[self.state.value]()
         except AttributeError as e:
             log.critical(f'Exception during state processing: {e}')
             return False
@@ -81,13 +90,14 @@ class Sequencer(QObject):
         new = self.state.name
         if old != new:
             self.debug(f'[{old}] -> [{new}]')
+            self.stateChanged.emit(self.state.value)
 
         return True
 
     # --------------
     # Methods for running the sequencer as a task
     @property
-    def stopping(self): return self._stop.isSet()
+    def stopping(self): return self._stop.is_set()
 
     def stop(self):
         self._stop.set()
@@ -101,10 +111,13 @@ class Sequencer(QObject):
         hb = 0
 
         self.info(f'Sequencer starting.')
-        while not self._stop.wait(self.tickrate):
+        wait = self._stop.wait
+        while not wait(self.tickrate):
 
+            # Throttle the heartbeat, there's no need to wake the UI thread every tick
             hb += 1
-            self.heartbeat.emit(hb)
+            if hb % self.heartbeatInterval == 0:
+                self.heartbeat.emit(hb)
 
             # Run the state machine once
             self.run()
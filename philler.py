@@ -1,34 +1,43 @@
-import coloredlogs, logging
+import coloredlogs, logging, logging.handlers
+import os
+import queue
 
 # -------------------------------------------------------------------------
-# Set up the base logger
+# Set up the base logger, at INFO unless PHILLER_LOG_LEVEL asks for something else (e.g. DEBUG when developing)
 coloredlogs.DEFAULT_LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
 coloredlogs.DEFAULT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
-coloredlogs.install(level='DEBUG')
+coloredlogs.install(level=os.environ.get('PHILLER_LOG_LEVEL', 'INFO').upper())
 log = logging.getLogger('')
 
+# Format and write the log from a background thread, so the GUI and sequencer threads only queue the records
+logHandlers = list(log.handlers)
+for handler in logHandlers:
+    log.removeHandler(handler)
+log.addHandler(logging.handlers.QueueHandler(queue.SimpleQueue()))
+logListener = logging.handlers.QueueListener(log.handlers[0].queue, *logHandlers, respect_handler_level=True)
+logListener.start()
+
 # Disable the debug logging from Qt
 logging.getLogger('PyQt5').setLevel(logging.WARNING)
 
-import math
 import sys
 import functools
-import os
 import datetime
 import random
+import time
 import argparse
 from enum import Enum, auto, IntEnum
-from queue import SimpleQueue
+from collections import deque
 
-from PyQt5 import QtCore, QtWidgets, uic, QtMultimedia
-from PyQt5.QtWidgets import QMessageBox, QLabel, QPushButton, QToolButton, QGridLayout, QSpacerItem, QSizePolicy
-from PyQt5.QtCore import Qt, QSize, QTimer, QObject, QThread, pyqtSignal
-from PyQt5.QtGui import QFont
+from PyQt5 import QtWidgets, uic
+from PyQt5.QtWidgets import QMessageBox, QLabel, QPushButton, QGridLayout, QSpacerItem, QSizePolicy, QWidget
+from PyQt5.QtCore import Qt, QTimer, QObject, QThread, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QFont, QPalette
 
 import Configuration
 from Configuration import CFG
 
-from Hardware import Filler
+from Hardware import Filler, FillerStatus
 from Sequencer import Sequencer
 from CountdownTimer import CountdownTimer
 
@@ -41,6 +50,22 @@ PHILLER_FONT = 'Montserrat Medium'
 # Variables for simulated I/O
 simulate = False
 
+# The (message, enable) shown for a state that hasn't set one
+EMPTY_MESSAGE = ('', False)
+
+# Display text for a switch state, indexed by the state
+ONOFF = ('OFF', 'ON')
+
+# Display text and color for the connection state, indexed by the state
+CONNECTION_TEXT = ('DISCONNECTED', 'CONNECTED')
+CONNECTION_COLORS = (Qt.red, Qt.darkGreen)
+
+# Minimum time between updates of the status widgets, in ms
+STATUS_THROTTLE_MS = 50
+
+# The filler sends its status several times a second, so one older than this means its thread has stalled (s)
+STATUS_STALE = 1.0
+
 class PAGES(Enum):
     """
     The pages in the application.
@@ -51,6 +76,9 @@ class PAGES(Enum):
     CLEAN = auto()
     SETUP = auto()
 
+# Message box shared by showDialog(), created on first use (it needs the QApplication to exist)
+dialogBox = None
+
 def showDialog(text, yes=False, cancel=False):
     """
     Show a message box to the user.
@@ -61,11 +89,16 @@ def showDialog(text, yes=False, cancel=False):
     :return: Nothing.
     """
 
-    # Create a message box
-    msgbox = QtWidgets.QMessageBox()
-    msgbox.setIcon(QMessageBox.Information)
+    global dialogBox
+
+    # Create the message box once, and reuse it for every message
+    if dialogBox is None:
+        dialogBox = QtWidgets.QMessageBox()
+        dialogBox.setIcon(QMessageBox.Information)
+        dialogBox.setWindowTitle('Message')
+
+    msgbox = dialogBox
     msgbox.setText(text)
-    msgbox.setWindowTitle('Message')
 
     # Add buttons, either OK or OK+Cancel or Yes+No
     if yes:
@@ -77,13 +110,16 @@ def showDialog(text, yes=False, cancel=False):
 
     # Test the return from the message box
     returnvalue = msgbox.exec()
-    if returnvalue in [QMessageBox.Ok, QMessageBox.Yes]:
+    if returnvalue in (QMessageBox.Ok, QMessageBox.Yes):
         return True
     else:
         return False
 
 class FillingSequencer(Sequencer):
 
+    # Emitted with (message, enable) when the message to show on the progress screen changes
+    messageChanged = pyqtSignal(str, bool)
+
     class STATES(IntEnum):
         """
         The state machine will enter on the 0th state, and when it reaches the final state it will terminate.
@@ -155,13 +191,23 @@ class FillingSequencer(Sequencer):
         # Setup screen
         #SETUP_SAVE                  = auto()
 
+    # Buttons that end the fill sequence (along with the stop switch)
+    ABORT_BUTTONS = frozenset({BUTTONS.EXIT})
+
+    # Tasks that can be requested from the filler hardware
+    TASKS = Filler.TASKS
+
+    # The states that show the fill panel
+    FILL_STATES = frozenset(range(STATES.FILL_PREP1, STATES.FILL_TERMINATE))
+
     def __init__(self, filler):
         super(FillingSequencer, self).__init__()
 
-        # The messages that are shown on the progress screen.  Each dict entry is a tuple (message, flag).  Set the
-        # flag parameter to FALSE to prevent the user from pressing the button to proceed (some other condition will
-        # allow proceeding).
-        self.messages = dict()
+        # The messages that are shown on the progress screen, indexed by state.  Each entry is a tuple (message, flag).
+        # Set the flag parameter to FALSE to prevent the user from pressing the button to proceed (some other condition
+        # will allow proceeding).
+        self.messages = [EMPTY_MESSAGE] * len(self.STATES)
+        self.lastMessage = None # The last message sent to the GUI
 
         # Retain a reference to the filler hardware
         self.filler = filler
@@ -169,6 +215,9 @@ class FillingSequencer(Sequencer):
         # Get a ref to the system config
         self.config = Configuration.config
 
+        # Configured values used while sequencing, cached at the start of each sequence
+        self.loadSettings()
+
         # Setup the sequencer with the states we plan to use
         self.prepare(self.STATES)
 
@@ -181,8 +230,10 @@ class FillingSequencer(Sequencer):
         self.cleaningTimer = CountdownTimer()
         self.cleaningTimer.expire()
 
-        # A queue for requests from the user
-        self.requests = SimpleQueue()
+        # The latest request from the user.  A one slot deque, so a new press replaces one not yet handled, and
+        # append/popleft are atomic without any locking across threads.
+        self.requests = deque(maxlen=1)
+        self.exitRequested = False # Exits are latched separately, so a later press can't replace one
 
         # Diagnostic page dispense value for testing
         self.diagDispense = 250
@@ -193,12 +244,15 @@ class FillingSequencer(Sequencer):
 
         # For display of final fill time
         self.finalDispenseTime = 0
+        self.fillingMessage = ''
 
         # Count how many times the user purged into a bottle
         self.purgeCount = 0
+        self.primingMessage = ''
 
         # Count how many bottles filled
         self.filledCount = 0
+        self.filledMessage = ''
 
         # Feedback on how much we were over
         self.overagePct = 0.0
@@ -206,31 +260,69 @@ class FillingSequencer(Sequencer):
     @property
     def message(self):
         """Return the message associated with the current state"""
-        try:
-            text, enable = self.messages[self.state]
-        except KeyError:
-            text = ''
-            enable = False
-
-        return text, enable
+        return self.messages[self.state]
 
     def setMessage(self, message, enable):
-        """Set the message for the current state"""
-        self.messages[self.state] = (message, enable)
+        """Set the message for the current state, and notify the GUI only if it changed"""
+        message = (message, enable)
+        self.messages[self.state] = message
+
+        if message != self.lastMessage:
+            self.lastMessage = message
+            self.messageChanged.emit(*message)
+
+    def loadSettings(self):
+        """
+        Cache the configured values used by the fill and clean sequences, so they aren't looked up on every tick.  The
+        config can only be changed on the setup screen, so the values are constant for the duration of a sequence.
+
+        :return: Nothing.
+        """
+        getValue = self.config.getValue
+        self.tareTolerance = getValue(CFG.TARE_TOLERANCE)
+        self.fillPressure = getValue(CFG.FILL_PRESSURE)
+        self.bottleMinWeight = getValue(CFG.BOTTLE_MIN_WEIGHT)
+        self.purgeMaxCount = getValue(CFG.PURGE_MAX_COUNT)
+        self.purgeTime = getValue(CFG.PURGE_TIME)
+        self.initFillTime = getValue(CFG.FILL_INIT_DISPENSE_TIME)
+        self.initFillMin = getValue(CFG.FILL_INIT_DISPENSE_MIN)
+        self.fillOffset = getValue(CFG.DISPENSE_OFFSET)
+        self.fillWeight = getValue(CFG.FILL_WEIGHT)
+        self.fillWeightMin = getValue(CFG.FILL_WEIGHT_MIN)
+        self.maxFinalDispenseTime = getValue(CFG.FILL_FINAL_DISPENSE_MAX)
+        self.cleanDispenseTime = getValue(CFG.CLEAN_DISPENSE)
+
+        # Messages that depend on the settings, formatted once here rather than on every tick
+        self.tareMessage = f'Remove bottle,\nif present.\n\nTare scale (0.0 ±{self.tareTolerance}g).\n\n(Tap to continue)'
 
     # -------------------------------------------------------------------------
     def request(self, button):
-        """Create request to the state machine based on a button press"""
-        self.requests.put(button, block=False)
+        """Create request to the state machine based on a button press, replacing any that's still pending"""
+        if button in self.ABORT_BUTTONS:
+            self.exitRequested = True
+        else:
+            self.requests.append(button)
 
     def getRequest(self):
-        """Get the most recent request"""
-        if not self.requests.empty():
-            req = self.requests.get(block=False, timeout=0)
-        else:
-            req = None
-        
-        return req
+        """Get the most recent request, with a pending exit taking priority"""
+        if self.exitRequested:
+            self.exitRequested = False
+            return self.BUTTONS.EXIT
+
+        return self.requests.popleft() if self.requests else None
+
+    def checkAbort(self, req):
+        """
+        Handle the abort/exit buttons or stop switch, common to all the filling states.
+
+        :param req: The request read from the user this tick.
+        :return: True if the fill sequence was terminated.
+        """
+        if req in self.ABORT_BUTTONS or self.filler.stopswitch:
+            self.to_FILL_TERMINATE()
+            return True
+
+        return False
 
     # -------------------------------------------------------------------------
     def process_UNINIT(self):
@@ -242,11 +334,13 @@ class FillingSequencer(Sequencer):
         """Transition the user to the various main screens"""
         req = self.getRequest()
 
-        if req in [self.BUTTONS.MAIN_ENTER_FILL]:
+        if req == self.BUTTONS.MAIN_ENTER_FILL:
+            self.loadSettings()
             self.to_FILL_PREP1()
-        elif req in [self.BUTTONS.MAIN_ENTER_CLEAN]:
+        elif req == self.BUTTONS.MAIN_ENTER_CLEAN:
+            self.loadSettings()
             self.to_CLEAN()
-        elif req in [self.BUTTONS.MAIN_ENTER_DIAGNOSTICS]:
+        elif req == self.BUTTONS.MAIN_ENTER_DIAGNOSTICS:
             self.to_DIAGNOSTICS()
 
     # -------------------------------------------------------------------------
@@ -254,19 +348,19 @@ class FillingSequencer(Sequencer):
         """Run the diagnostics screen, not much to do here, state machine wise"""
         req = self.getRequest()
 
-        if req in [self.BUTTONS.EXIT]:
+        if req == self.BUTTONS.EXIT:
             self.to_STANDBY()
 
-        if req in [self.BUTTONS.DIAG_PRESSURE_ON]:
-            self.filler.request(task=self.filler.TASKS.PRESSURIZE)
+        if req == self.BUTTONS.DIAG_PRESSURE_ON:
+            self.filler.request(self.TASKS.PRESSURIZE)
 
-        if req in [self.BUTTONS.DIAG_PRESSURE_OFF]:
-            self.filler.request(task=self.filler.TASKS.VENT)
+        if req == self.BUTTONS.DIAG_PRESSURE_OFF:
+            self.filler.request(self.TASKS.VENT)
 
-        if req in [self.BUTTONS.DIAG_DISPENSE]:
-            self.filler.request(task=self.filler.TASKS.DISPENSE, param=self.diagDispense)
+        if req == self.BUTTONS.DIAG_DISPENSE:
+            self.filler.request(self.TASKS.DISPENSE, self.diagDispense)
 
-        if req in [self.BUTTONS.DIAG_SETUP]:
+        if req == self.BUTTONS.DIAG_SETUP:
             self.to_SETUP()
 
     # -------------------------------------------------------------------------
@@ -275,7 +369,7 @@ class FillingSequencer(Sequencer):
         req = self.getRequest()
 
         # Handle the exit button
-        if req in [self.BUTTONS.EXIT]:
+        if req == self.BUTTONS.EXIT:
             self.to_DIAGNOSTICS()
 
     # -------------------------------------------------------------------------
@@ -284,71 +378,72 @@ class FillingSequencer(Sequencer):
     def process_FILL_PREP1(self):
         """First filling screen page"""
 
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
         # Determine if scale is tared
-        tolerance = self.config.getValue(CFG.TARE_TOLERANCE)
+        tolerance = self.tareTolerance
         tared = (tolerance >= self.filler.weight >= -tolerance)
 
         if tared:
             self.setMessage('Remove bottle,\nif present.\n\n(Tap to continue)', True)
         else:
-            self.setMessage(f'Remove bottle,\nif present.\n\nTare scale (0.0 ±{tolerance}g).\n\n(Tap to continue)', False)
+            self.setMessage(self.tareMessage, False)
 
         # Skip to next screen if user presses the button
-        req = self.getRequest()
-        if req in [self.BUTTONS.FILL_NEXT]:
+        if req == self.BUTTONS.FILL_NEXT:
             self.to_FILL_PREP2()
 
-        # Handle the abort/exit buttons or stop switch
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     def process_FILL_PREP2(self):
         """Second filling screen page"""
 
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
         self.setMessage('Connect filled bulk\ncontainer, air in\nand liquid out.\n\nConnect compressor\nair tubing.\n\nStart compressor.\n\n(Tap to continue)',True)
 
         # Retain the current weight, as there should be no bottle present
         self.weightUnloaded = self.filler.weight
 
         # Skip to next screen if user presses the button
-        req = self.getRequest()
-        if req in [self.BUTTONS.FILL_NEXT]:
+        if req == self.BUTTONS.FILL_NEXT:
             self.to_FILL_RESET_STOP()
 
-        # Handle the abort/exit buttons or stop switch
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     def process_FILL_RESET_STOP(self):
         """Wait for the stop switch here"""
+
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
         self.setMessage('Reset the stop switch.', True)
 
         # Wait for the STOP switch state to be OFF/False
         if not self.filler.stopswitch:
             self.to_FILL_PRESSURIZE()
 
+    def process_FILL_PRESSURIZE(self):
+        """Wait for pressure to build up"""
+
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
 
-    def process_FILL_PRESSURIZE(self):
-        """Wait for pressure to build up"""
-        targetPressure = self.config.getValue(CFG.FILL_PRESSURE)
         self.setMessage('Pressurizing...', False)
 
         # Start pressurizing
-        self.filler.request(task=self.filler.TASKS.PRESSURIZE)
+        self.filler.request(self.TASKS.PRESSURIZE)
 
         # Advance to the next state when the pressure is over 20
-        if self.filler.pressure >= self.config.getValue(CFG.FILL_PRESSURE):
+        if self.filler.pressure >= self.fillPressure:
             self.to_FILL_PURGE_INIT()
 
-        # Handle the abort/exit buttons or stop switch
-        req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     # -------------------------------------------------------------------------
     # PURGING
     # -------------------------------------------------------------------------
@@ -363,6 +458,12 @@ class FillingSequencer(Sequencer):
 
     def process_FILL_PURGE_SETUP(self):
         """Wait for fill switch or screen tap to purge the nozzle"""
+
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
         self.setMessage('Ready for priming.\n\nPlace a bottle under\nneedle.\n\nPress fill switch to\nprime tubing, until\nall air is removed.\n\nRemove bottle.\n\n(Tap to continue)', True)
 
         # Wait for a fill switch
@@ -372,16 +473,16 @@ class FillingSequencer(Sequencer):
             self.filler.fillswitchLatched = False
 
             # Permit only 5 purges into a bottle without forcing the user to dump/reset it
-            maxPurges = self.config.getValue(CFG.PURGE_MAX_COUNT)
-            if self.purgeCount >= maxPurges:
+            if self.purgeCount >= self.purgeMaxCount:
                 self.to_FILL_PURGE_RESET_WAIT()
                 return
 
             # Send the pulse to do a single purge
-            self.filler.request(task=self.filler.TASKS.DISPENSE, param=self.config.getValue(CFG.PURGE_TIME))
+            self.filler.request(self.TASKS.DISPENSE, self.purgeTime)
 
             # Account for the purge count
             self.purgeCount += 1
+            self.primingMessage = f'Priming...\n\n({self.purgeCount})'
 
             # Start a one second timer
             self.timer.start(seconds=1)
@@ -389,17 +490,18 @@ class FillingSequencer(Sequencer):
             self.to_FILL_PURGE_WAIT()
 
         # Skip to next screen if user presses the button
-        req = self.getRequest()
-        if req in [self.BUTTONS.FILL_NEXT]:
+        if req == self.BUTTONS.FILL_NEXT:
             self.to_FILL_PURGE_CLEAR_WAIT()
 
-        # Handle the abort/exit buttons or stop switch
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     def process_FILL_PURGE_WAIT(self):
         """Wait for the purge pulse to complete"""
-        self.setMessage(f'Priming...\n\n({self.purgeCount})', False)
+
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
+        self.setMessage(self.primingMessage, False)
 
         if self.timer.expired:
 
@@ -408,116 +510,120 @@ class FillingSequencer(Sequencer):
 
             self.to_FILL_PURGE_SETUP()
 
+    def process_FILL_PURGE_CLEAR_WAIT(self):
+        """Make sure we return to (nearly) tared 0 weight"""
+
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
 
-    def process_FILL_PURGE_CLEAR_WAIT(self):
-        """Make sure we return to (nearly) tared 0 weight"""
         self.setMessage('Remove object from\npriming area.', False)
 
-        tolerance = self.config.getValue(CFG.TARE_TOLERANCE)
+        tolerance = self.tareTolerance
         tared = (tolerance >= self.filler.weight >= -tolerance)
 
         # Wait for the user to remove any device used to capture purging
         if tared:
             self.to_FILL_LOAD_BOTTLE()
 
+    def process_FILL_PURGE_RESET_WAIT(self):
+        """Waiting for user to remove the bottle before resetting purge sequence"""
+
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
 
-    def process_FILL_PURGE_RESET_WAIT(self):
-        """Waiting for user to remove the bottle before resetting purge sequence"""
         # Wait for the weight to return to the tare weight again
         self.setMessage('Max primes into\nthis bottle exceeded.\n\nRemove bottle from\npriming area\nand empty it.', False)
 
-        tolerance = self.config.getValue(CFG.TARE_TOLERANCE)
+        tolerance = self.tareTolerance
         tared = (tolerance >= self.filler.weight >= -tolerance)
 
         # Wait for the user to remove any device used to capture purging
         if tared:
             self.to_FILL_PURGE_INIT()
 
-        # Handle the abort/exit buttons or stop switch
-        req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     # -------------------------------------------------------------------------
     # FILLING
     # -------------------------------------------------------------------------
     def process_FILL_CLEAR_BOTTLE(self):
         """Make sure we return to (nearly) tared 0 weight"""
-        self.setMessage(f'Remove bottle.\n\n{self.filledCount} bottle(s) filled.', False)
 
-        tolerance = self.config.getValue(CFG.TARE_TOLERANCE)
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
+        self.setMessage(self.filledMessage, False)
+
+        tolerance = self.tareTolerance
         tared = (tolerance >= self.filler.weight >= -tolerance)
 
         # Wait for the user to remove the bottle (from the previous fill)
         if tared:
             self.to_FILL_LOAD_BOTTLE()
 
+    def process_FILL_LOAD_BOTTLE(self):
+        """Bottle loading step"""
+
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
 
-    def process_FILL_LOAD_BOTTLE(self):
-        """Bottle loading step"""
         self.setMessage('Place a bottle\nunder the filling\nneedle.', False)
 
         # Clear the stable flag (in case we are simulating here)
         self.filler.clearStable()
 
         # Wait for the weight to increase by some minimum amount
-        if self.filler.weight >= self.config.getValue(CFG.BOTTLE_MIN_WEIGHT):
+        if self.filler.weight >= self.bottleMinWeight:
             self.to_FILL_LOAD_BOTTLE_WAIT()
 
+    def process_FILL_LOAD_BOTTLE_WAIT(self):
+        """Bottle load confirmation"""
+
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
 
-    def process_FILL_LOAD_BOTTLE_WAIT(self):
-        """Bottle load confirmation"""
         self.setMessage('Waiting for bottle\nweight to stabilize...', True)
 
+        # Read the weight once, so the checks and the retained value agree
+        weight = self.filler.weight
+
         # Wait for the user to load a bottle and stabilize the scale
         if self.filler.stable:
 
-            if self.filler.weight >= self.config.getValue(CFG.BOTTLE_MIN_WEIGHT):
-                self.weightWithBottle = self.filler.weight
+            if weight >= self.bottleMinWeight:
+                self.weightWithBottle = weight
                 self.to_FILL_READY_SETUP()
 
 
         # TODO - detect that user removed the bottle!
         # TODO - detect that the user put a bottle that's too heavy on!
 
-        req = self.getRequest()
         # Skip to next screen if user presses the button
-        if req in [self.BUTTONS.FILL_NEXT]:
-            self.weightWithBottle = self.filler.weight
+        if req == self.BUTTONS.FILL_NEXT:
+            self.weightWithBottle = weight
             self.to_FILL_READY_SETUP()
 
-        # Handle the abort/exit buttons or stop switch
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     def process_FILL_READY_SETUP(self):
         """Init the state by clearing any previous fill switches"""
         self.filler.fillswitchLatched = False
         self.to_FILL_READY_WAIT()
 
+    def process_FILL_READY_WAIT(self):
+        """Waiting for user to hit the fill switch to do a fill"""
+
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
 
-    def process_FILL_READY_WAIT(self):
-        """Waiting for user to hit the fill switch to do a fill"""
         self.setMessage('Ready to fill bottle.\n\nPress fill\nswitch once to fill\nbottle.', False)
 
         # TODO - detect the removal of a bottle
@@ -529,15 +635,10 @@ class FillingSequencer(Sequencer):
             self.filler.fillswitchLatched = False
             self.to_FILL_INIT_FILLING()
 
-        # Handle the abort/exit buttons or stop switch
-        req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     def process_FILL_INIT_FILLING(self):
         """Start an initial fill"""
-        initFillTime = self.config.getValue(CFG.FILL_INIT_DISPENSE_TIME)
-        self.filler.request(task=self.filler.TASKS.DISPENSE, param=initFillTime)
+        initFillTime = self.initFillTime
+        self.filler.request(self.TASKS.DISPENSE, initFillTime)
 
         # Start a timer to wait at least as long as the fill will take
         self.timer.start(milliseconds=(initFillTime+500))
@@ -550,10 +651,17 @@ class FillingSequencer(Sequencer):
 
     def process_FILL_INIT_FILLING_WAIT(self):
         """Waiting for initial fill to complete"""
-        self.setMessage('Performing initial\nbottle fill...', False)
 
-        # Wait for fill to complete
-        if self.timer.expired:
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
+        # Wait for fill to complete, showing one message per tick so the GUI is only notified when it changes
+        if not self.timer.expired:
+            self.setMessage('Performing initial\nbottle fill...', False)
+
+        else:
             self.setMessage('Waiting for scale\nto stabilize...', False)
 
             # Wait for the scale to stop changing
@@ -563,30 +671,31 @@ class FillingSequencer(Sequencer):
                 self.filler.clearStable()
 
                 # Reference the tunable options
-                initFillTime = self.config.getValue(CFG.FILL_INIT_DISPENSE_TIME) # nominally 1500ms
-                initFillMin = self.config.getValue(CFG.FILL_INIT_DISPENSE_MIN) # maybe 4g?
-                fillOffset = self.config.getValue(CFG.DISPENSE_OFFSET) # 1.5g
-                totalFillWeight = self.config.getValue(CFG.FILL_WEIGHT) # 28.12g
-                maxFinalDispenseTime = self.config.getValue(CFG.FILL_FINAL_DISPENSE_MAX) # 1500ms
+                initFillTime = self.initFillTime # nominally 1500ms
+                initFillMin = self.initFillMin # maybe 4g?
+                fillOffset = self.fillOffset # 1.5g
+                totalFillWeight = self.fillWeight # 28.12g
+                maxFinalDispenseTime = self.maxFinalDispenseTime # 1500ms
 
                 log.debug(f'initFillTime = {initFillTime}, fillOffset = {fillOffset}, totalFillWeight = {totalFillWeight}')
 
                 # How much did we get, less the bottle weight?
-                weightInitialFill = self.filler.weight - self.weightWithBottle
+                weight = self.filler.weight
+                weightInitialFill = weight - self.weightWithBottle
 
                 # If it was not sufficient, we may be out of bulk.  Abort the fill.
                 if weightInitialFill < initFillMin:
                     self.to_FILL_INIT_FILLING_FAILED()
                     return
 
-                # Calculate filling rate
-                slope = (weightInitialFill - fillOffset) / initFillTime
+                # Calculate filling rate, as the time per gram so the dispense time is a multiply
+                msPerGram = initFillTime / (weightInitialFill - fillOffset)
 
                 # How much do we have left to fill?
                 weightRemaining = (totalFillWeight - weightInitialFill)
 
                 # How long will it take to fill it?
-                self.finalDispenseTime = math.trunc((weightRemaining - fillOffset) / slope)
+                self.finalDispenseTime = int((weightRemaining - fillOffset) * msPerGram)
 
                 # Clip the dispense time to prevent overfills
                 if self.finalDispenseTime > maxFinalDispenseTime:
@@ -594,14 +703,17 @@ class FillingSequencer(Sequencer):
                     log.critical(f'CLIPPING DISPENSE TIME TO MAXIMUM! ({maxFinalDispenseTime}ms)')
 
                 log.debug(f'pre fill weightWithBottle: {self.weightWithBottle:0.2f}')
-                log.debug(f'total initial fill weight: {self.filler.weight:0.2f}g')
+                log.debug(f'total initial fill weight: {weight:0.2f}g')
                 log.debug(f'difference weightInitialFill: {weightInitialFill:0.2f}g')
-                log.debug(f'slope: {slope:0.5f}')
+                log.debug(f'slope: {1 / msPerGram:0.5f}')
                 log.debug(f'weightRemaining: {weightRemaining:0.2f}g')
                 log.debug(f'finalDispenseTime: {self.finalDispenseTime}ms')
 
+                # The message shown while filling only depends on the dispense time
+                self.fillingMessage = f'Filling for {self.finalDispenseTime} ms...'
+
                 # Trigger the final fill
-                self.filler.request(task=self.filler.TASKS.DISPENSE, param=self.finalDispenseTime)
+                self.filler.request(self.TASKS.DISPENSE, self.finalDispenseTime)
 
                 # Start a timer to wait at least as long as the fill will take
                 self.timer.start(milliseconds=(self.finalDispenseTime+500))
@@ -609,30 +721,33 @@ class FillingSequencer(Sequencer):
                 # Advance to state to wait for fill completion
                 self.to_FILL_FILLING_WAIT()
 
-        # Handle the abort/exit buttons or stop switch
-        req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     def process_FILL_INIT_FILLING_FAILED(self):
         """Something failed in the init fill"""
-        self.setMessage(f'Initial fill failed.\nDiagnose problem and\nstart fill again.\n\n(Tap to end)', True)
 
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if req in [self.BUTTONS.FILL_NEXT]:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
 
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        self.setMessage('Initial fill failed.\nDiagnose problem and\nstart fill again.\n\n(Tap to end)', True)
 
+        # End the fill if user presses the button
+        if req == self.BUTTONS.FILL_NEXT:
+            self.to_FILL_TERMINATE()
 
     def process_FILL_FILLING_WAIT(self):
         """Wait for the final fill to complete"""
-        self.setMessage(f'Filling for {self.finalDispenseTime} ms...', False)
 
-        # Wait for fill to complete
-        if self.timer.expired:
+        # Handle the abort/exit buttons or stop switch
+        req = self.getRequest()
+        if self.checkAbort(req):
+            return
+
+        # Wait for fill to complete, showing one message per tick so the GUI is only notified when it changes
+        if not self.timer.expired:
+            self.setMessage(self.fillingMessage, False)
+
+        else:
             self.setMessage('Waiting for scale\nto stabilize...', False)
 
             # Wait for the scale to stop changing
@@ -642,10 +757,11 @@ class FillingSequencer(Sequencer):
                 self.filler.clearStable()
 
                 # Did we get the desired amount of product?
-                minFillWeight = self.config.getValue(CFG.FILL_WEIGHT_MIN)  # nominally 27.3
-                actualWeight = self.filler.weight - self.weightWithBottle
+                minFillWeight = self.fillWeightMin  # nominally 27.3
+                weight = self.filler.weight
+                actualWeight = weight - self.weightWithBottle
 
-                log.debug(f'Final weight: {self.filler.weight:0.2f}g')
+                log.debug(f'Final weight: {weight:0.2f}g')
                 log.debug(f'Delivered: {actualWeight:0.2f}g')
                 log.debug(f'Minimum: {minFillWeight:0.2f}g')
 
@@ -657,42 +773,36 @@ class FillingSequencer(Sequencer):
                 with open('fillog.txt', 'a') as filllog:
 
                     now = datetime.datetime.now().isoformat()
-                    out = f'{now},{actualWeight:0.2f},{self.filler.weight:0.2f}\n'
+                    out = f'{now},{actualWeight:0.2f},{weight:0.2f}\n'
                     filllog.write(out)
 
                 if actualWeight >= minFillWeight:
                     # Got what we wanted, fill another
                     self.filledCount += 1
+                    self.filledMessage = f'Remove bottle.\n\n{self.filledCount} bottle(s) filled.'
                     self.to_FILL_CLEAR_BOTTLE()
                 else:
                     # Low fill.  Abort.
                     self.to_FILL_FILLING_FAILED()
 
-        # Handle the abort/exit buttons or stop switch
-        req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
-
     def process_FILL_FILLING_FAILED(self):
         """Something failed in the final fill"""
-        self.setMessage(f'Low fill weight!\n\nBulk empty?\n\nDiscard short filled\nbottle.\n\nPress stop to return\nto main menu.', True)
-
-        # Wait for user to hit stop switch
-        if self.filler.stopswitch: self.to_FILL_TERMINATE()
 
         # Handle the abort/exit buttons or stop switch
         req = self.getRequest()
-        if (req in [self.BUTTONS.EXIT]) or self.filler.stopswitch:
-            self.to_FILL_TERMINATE()
+        if self.checkAbort(req):
+            return
+
+        self.setMessage('Low fill weight!\n\nBulk empty?\n\nDiscard short filled\nbottle.\n\nPress stop to return\nto main menu.', True)
 
     def process_FILL_TERMINATE(self):
         log.info('Terminating fill sequence.')
 
         # Zero out any pulse in progress
-        self.filler.request(task=self.filler.TASKS.ABORT)
+        self.filler.request(self.TASKS.ABORT)
 
         # Vent the bulk
-        self.filler.request(task=self.filler.TASKS.VENT)
+        self.filler.request(self.TASKS.VENT)
 
         # Back to first page
         self.to_STANDBY()
@@ -702,36 +812,36 @@ class FillingSequencer(Sequencer):
     # -------------------------------------------------------------------------
     def process_CLEAN(self):
         """Run the cleaning screen, not much to do here, state machine wise"""
-        cleanDispenseTime = self.config.getValue(CFG.CLEAN_DISPENSE)
+        cleanDispenseTime = self.cleanDispenseTime
 
         req = self.getRequest()
 
-        if req in [self.BUTTONS.EXIT]:
+        if req == self.BUTTONS.EXIT:
             # Zero out any pulse in progress
-            self.filler.request(task=self.filler.TASKS.ABORT)
+            self.filler.request(self.TASKS.ABORT)
 
             # Vent the bulk
-            self.filler.request(task=self.filler.TASKS.VENT)
+            self.filler.request(self.TASKS.VENT)
 
             self.to_STANDBY()
 
-        elif req in [self.BUTTONS.MAIN_ENTER_DIAGNOSTICS]:
+        elif req == self.BUTTONS.MAIN_ENTER_DIAGNOSTICS:
             self.to_DIAGNOSTICS()
 
-        if req in [self.BUTTONS.CLEAN_PRESSURE_ON]:
-            self.filler.request(task=self.filler.TASKS.PRESSURIZE)
+        if req == self.BUTTONS.CLEAN_PRESSURE_ON:
+            self.filler.request(self.TASKS.PRESSURIZE)
 
-        if req in [self.BUTTONS.CLEAN_PRESSURE_OFF]:
-            self.filler.request(task=self.filler.TASKS.VENT)
+        if req == self.BUTTONS.CLEAN_PRESSURE_OFF:
+            self.filler.request(self.TASKS.VENT)
 
-        if req in [self.BUTTONS.CLEAN_DISPENSE_ON]:
-            self.filler.request(task=self.filler.TASKS.DISPENSE, param=cleanDispenseTime)
+        if req == self.BUTTONS.CLEAN_DISPENSE_ON:
+            self.filler.request(self.TASKS.DISPENSE, cleanDispenseTime)
 
             # Start timing the dispense
             self.cleaningTimer.start(milliseconds=cleanDispenseTime)
 
-        if req in [self.BUTTONS.CLEAN_DISPENSE_OFF]:
-            self.filler.request(task=self.filler.TASKS.DISPENSE, param=0)
+        if req == self.BUTTONS.CLEAN_DISPENSE_OFF:
+            self.filler.request(self.TASKS.DISPENSE, 0)
 
             # Stop the timer
             self.cleaningTimer.expire()
@@ -740,15 +850,28 @@ class FillingSequencer(Sequencer):
         # out, restart the dispense and renew the timer
         if not self.cleaningTimer.expired:
             if self.cleaningTimer.remaining < 1000:
-                self.filler.request(task=self.filler.TASKS.DISPENSE, param=cleanDispenseTime)
+                self.filler.request(self.TASKS.DISPENSE, cleanDispenseTime)
                 self.cleaningTimer.start(milliseconds=cleanDispenseTime)
 
     def process_TERMINATE(self):
         """Nothing to do here (yet)"""
         pass
 
+class ConfigSaver(QObject):
+    """
+    Saves the configuration from its own thread, so a slow SD card doesn't stall the GUI.
+    """
+
+    @pyqtSlot()
+    def save(self):
+        """Write any changed configuration items to the INI file"""
+        Configuration.config.save()
+
 class MainWindow(QtWidgets.QMainWindow):
 
+    # Request to write the configuration to disk, handled on the config thread
+    saveConfig = pyqtSignal()
+
     class RefWidgets:
         """
         Container class for the widgets on the form that has stronger typing for use in IDEs.
@@ -798,6 +921,23 @@ class MainWindow(QtWidgets.QMainWindow):
         gl_setup_configurables    = QtWidgets.QGridLayout          # type: QtWidgets.QGridLayout
 
 
+        # The (name, type) of each widget declared above, collected once on first use
+        widgetSpec = None
+
+        @classmethod
+        def widgets(cls):
+            """
+            Get the widgets declared in this class, caching the list on the class so it's only built once.
+
+            :return: Tuple of (name, type) for each widget.
+            """
+            if cls.widgetSpec is None:
+                widgetTypes = (QtWidgets.QWidget, QtWidgets.QLayout)
+                cls.widgetSpec = tuple((name, wtype) for name, wtype in vars(cls).items()
+                                       if isinstance(wtype, type) and issubclass(wtype, widgetTypes))
+
+            return cls.widgetSpec
+
         def __init__(self, form):
             """
             Iterate all the widgets in this class and find their actual instances in the form.
@@ -806,22 +946,16 @@ class MainWindow(QtWidgets.QMainWindow):
             :return: Nothing.
             """
 
-            for name in dir(self):
-
-                # Skip the entities that aren't the desired widgets
-                if name.startswith('__'):
-                    continue
+            # Walk the form once, indexing every object by name (Designer keeps the names unique)
+            index = {child.objectName(): child for child in form.findChildren(QObject)}
 
-                # Skip the methods
-                if name == 'add':
-                    continue
+            for name, wtype in self.widgets():
 
                 # Find the widget on the form by name and type
-                wtype = self.__getattribute__(name)
-                widget = form.findChild(wtype, name)
+                widget = index.get(name)
 
                 # Bail out if we can't find one!
-                if widget is None:
+                if not isinstance(widget, wtype):
                     print(f'Cannot locate widget {name} of type {wtype} in UI file!')
                     exit(1)
 
@@ -846,6 +980,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.popups = {}
         self.template = None
 
+        # The last values shown on the status widgets, so they are only updated on a change
+        self.lastStatus = dict()
+
+        # The latest values from the filler device, sent over from its thread
+        self.fillerStatus = FillerStatus(False, 0.0, 0.0, False, False, False, False)
+        self.fillerStatusTime = time.monotonic()
+
         QtWidgets.QMainWindow.__init__(self, *args, **kwargs)
 
         # Get a ref to the system config
@@ -887,8 +1028,19 @@ class MainWindow(QtWidgets.QMainWindow):
         self.filler.finished.connect(self.filler.deleteLater)
         self.fillerThread.finished.connect(self.fillerThread.deleteLater)
 
+        # Keep a copy of the filler's status, rather than reading its attributes across threads
+        self.filler.statusUpdated.connect(self.setFillerStatus)
+
+        # The filler can send its status at the serial frame rate, so limit how often the status is shown
+        self.statusThrottle = QTimer()
+        self.statusThrottle.setSingleShot(True)
+        self.statusThrottle.setInterval(STATUS_THROTTLE_MS)
+        self.statusThrottle.timeout.connect(self.updateStatus)
+
         # Filling device state machine
         self.seq = FillingSequencer(filler=self.filler)
+        self.buttons = self.seq.BUTTONS
+        self.states = self.seq.STATES
         self.seqThread = QThread()
         self.seq.moveToThread(self.seqThread)
         self.seqThread.started.connect(self.seq.main)
@@ -896,21 +1048,22 @@ class MainWindow(QtWidgets.QMainWindow):
         self.seq.finished.connect(self.seq.deleteLater)
         self.seqThread.finished.connect(self.seqThread.deleteLater)
 
+        # Show the sequencer's messages as they change, rather than polling them
+        self.seq.messageChanged.connect(self.updateMessage)
+
+        # Switch the visual components when the state machine changes state
+        self.seq.stateChanged.connect(self.updateState)
+
         self.w.b_main_shutdown.clicked.connect(QtWidgets.qApp.quit)
 
         # Start the threads
         self.fillerThread.start()
         self.seqThread.start()
 
-        # Define timers to periodically update screen widgets
+        # The status is shown as the filler sends it, so the timer only checks that it is still arriving
         self.statusTimer = QTimer()
-        self.statusTimer.timeout.connect(self.updateStatus)
-        self.statusTimer.start(100)
-
-        # A timer for the state machine visual components
-        self.stateTimer = QTimer()
-        self.stateTimer.timeout.connect(self.updateState)
-        self.stateTimer.start(100)
+        self.statusTimer.timeout.connect(self.checkFillerStatus)
+        self.statusTimer.start(500)
 
         # Start out on the main page
         self.w.sw_pages.setCurrentIndex(0)
@@ -920,7 +1073,7 @@ class MainWindow(QtWidgets.QMainWindow):
         diag = self.findChild(QtWidgets.QAction, 'actionDiagnostics') # type: QAction
         diag.setShortcut('Ctrl+D')
         diag.setStatusTip('Diagnostics')
-        diag.triggered.connect(lambda: self.seq.request(self.seq.BUTTONS.MAIN_ENTER_DIAGNOSTICS))
+        diag.triggered.connect(functools.partial(self.requestButton, self.buttons.MAIN_ENTER_DIAGNOSTICS))
 
         # Add a state name to the status bar
         self.l_state = QtWidgets.QLabel()
@@ -939,94 +1092,133 @@ class MainWindow(QtWidgets.QMainWindow):
         self.b_stable_simulate = QtWidgets.QPushButton('STA')
 
         if simulate:
-            self.w.statusbar.addPermanentWidget(self.b_fill_switch_simulate, stretch=1)
-            self.w.statusbar.addPermanentWidget(self.b_stop_switch_simulate, stretch=1)
-            self.w.statusbar.addPermanentWidget(self.b_pressure_simulate, stretch=1)
-            self.w.statusbar.addPermanentWidget(self.b_weight_simulate, stretch=1)
-            self.w.statusbar.addPermanentWidget(self.b_stable_simulate, stretch=1)
-            self.b_fill_switch_simulate.clicked.connect(self.buttonClicked)
-            self.b_stop_switch_simulate.clicked.connect(self.buttonClicked)
-            self.b_pressure_simulate.clicked.connect(self.buttonClicked)
-            self.b_weight_simulate.clicked.connect(self.buttonClicked)
-            self.b_stable_simulate.clicked.connect(self.buttonClicked)
+            for button in (self.b_fill_switch_simulate, self.b_stop_switch_simulate, self.b_pressure_simulate,
+                           self.b_weight_simulate, self.b_stable_simulate):
+                self.w.statusbar.addPermanentWidget(button, stretch=1)
 
         # Add a connection status light to the status bar
         self.l_connected = QtWidgets.QLabel()
-        self.l_connected.setText('TEXT')
-        self.l_connected.setStyleSheet('color: red')
         self.w.statusbar.addPermanentWidget(self.l_connected)
 
-        # Hook the buttons to their processing logic
-        for button in [
+        # Build a palette for each connection state once, so the label just swaps between them
+        self.connectionPalettes = list()
+        for color in CONNECTION_COLORS:
+            palette = QPalette(self.l_connected.palette())
+            palette.setColor(QPalette.WindowText, color)
+            self.connectionPalettes.append(palette)
+
+        self.l_connected.setText(CONNECTION_TEXT[False])
+        self.l_connected.setPalette(self.connectionPalettes[False])
+
+        # The processing logic for each button
+        w = self.w
+        buttons = self.buttons
+        request = self.requestButton
+        buttonHandlers = {
             # Main panel
-            self.w.b_main_fill_bottles, self.w.b_main_clean_system,
+            w.b_main_fill_bottles:          functools.partial(request, buttons.MAIN_ENTER_FILL),
+            w.b_main_clean_system:          functools.partial(request, buttons.MAIN_ENTER_CLEAN),
             # Fill panel
-            self.w.b_fill_back, self.w.b_fill_next,
+            w.b_fill_back:                  functools.partial(request, buttons.EXIT),
+            w.b_fill_next:                  functools.partial(request, buttons.FILL_NEXT),
             # Clean panel
-            self.w.b_clean_back, self.w.b_clean_pressure_on, self.w.b_clean_pressure_off, self.w.b_clean_dispense_on,
-            self.w.b_clean_dispense_off,
+            w.b_clean_back:                 functools.partial(request, buttons.EXIT),
+            w.b_clean_pressure_on:          functools.partial(request, buttons.CLEAN_PRESSURE_ON),
+            w.b_clean_pressure_off:         functools.partial(request, buttons.CLEAN_PRESSURE_OFF),
+            w.b_clean_dispense_on:          functools.partial(request, buttons.CLEAN_DISPENSE_ON),
+            w.b_clean_dispense_off:         functools.partial(request, buttons.CLEAN_DISPENSE_OFF),
             # Diagnostics panel
-            self.w.b_diag_back, self.w.b_diag_sound_test, self.w.b_diag_pressure_on, self.w.b_diag_pressure_off,
-            self.w.b_diag_dispense, self.w.b_diag_setup,
+            w.b_diag_back:                  functools.partial(request, buttons.EXIT),
+            w.b_diag_sound_test:            self.play,
+            w.b_diag_pressure_on:           functools.partial(request, buttons.DIAG_PRESSURE_ON),
+            w.b_diag_pressure_off:          functools.partial(request, buttons.DIAG_PRESSURE_OFF),
+            w.b_diag_dispense:              self.requestDiagDispense,
+            w.b_diag_setup:                 functools.partial(request, buttons.DIAG_SETUP),
             # Setup panel
-            self.w.b_setup_back,
-            ]:
+            w.b_setup_back:                 functools.partial(request, buttons.EXIT),
+            # Simulated I/O
+            self.b_fill_switch_simulate:    self.pressSimulatedFillSwitch,
+            self.b_stop_switch_simulate:    self.toggleSimulatedStopSwitch,
+            self.b_pressure_simulate:       self.promptSimulatedPressure,
+            self.b_weight_simulate:         self.promptSimulatedWeight,
+            self.b_stable_simulate:         self.toggleSimulatedStable,
+            }
+
+        # Hook each button straight to its own handler.  The handlers are all bound to this window, so the clicks are
+        # handled on the GUI thread; a partial of a sequencer/filler method would make PyQt queue the call to a worker
+        # thread whose event loop never runs.
+        for button, handler in buttonHandlers.items():
+            button.clicked.connect(handler)
 
-            button.clicked.connect(self.buttonClicked)
+        # Configuration saving, on a thread with its own event loop
+        self.configSaver = ConfigSaver()
+        self.configThread = QThread()
+        self.configSaver.moveToThread(self.configThread)
+        self.saveConfig.connect(self.configSaver.save)
+        self.configThread.start()
+        QtWidgets.qApp.aboutToQuit.connect(self.stopConfigThread)
 
-        # Build the setup screen
-        self.setupConfigurables()
+        # The setup screen rows live in a container widget, built the first time the setup panel is shown
+        self.configurablesHost = None
 
+        # The max pressure scale only changes when it's reconfigured
+        self.updatePressureScale()
 
 
 
     def setupConfigurables(self):
         """Setup the configurable items"""
 
-        # Clear out any previous configurable items
-        layout = self.w.gl_setup_configurables
-
-        while layout.count():
-            item = layout.takeAt(0)
-
-            if type(item) in [QtWidgets.QGridLayout, QtWidgets.QVBoxLayout, QtWidgets.QHBoxLayout]:
-                self.clearwidgets(item)
-                layout.removeItem(item)
-
-            if not item:
-                continue
-
-            w = item.widget()
-            if w:
-                w.setParent(None)
-
-        # Build the GUI elements for the configurables
-        for index, cfg in enumerate(Configuration.CFG):
-            value, units, displayname, _ = self.config.get(cfg)
-
-            displayname_label = QLabel(displayname)
-            displayname_label.setFont(QFont(PHILLER_FONT, 18))
-            displayname_label.setWordWrap(True)
-
-            value_label = QLabel(f'{value} {units}')
-            value_label.setFont(QFont(PHILLER_FONT, 18))
-            value_label.setStyleSheet('color: blue')
-
-            update_button = QPushButton('UPDATE')
-            update_button.setFont(QFont(PHILLER_FONT, 18))
-
-            """Bind the cfg parameter late because of:
-            https://stackoverflow.com/questions/19837486/lambda-in-a-loop
-            """
-            update_button.clicked.connect(functools.partial(self.changeConfigurable, cfg))
-
-            layout.addWidget(displayname_label, index, 0)
-            layout.addWidget(value_label, index, 1)
-            layout.addWidget(update_button, index, 2)
-
-        # Finish off with a spacer that pushes everything up to the top
-        verticalSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
-        layout.addItem(verticalSpacer)
+        # Hold off repainting the setup panel until all the rows are in place
+        panel = self.w.gl_setup_configurables.parentWidget()
+        panel.setUpdatesEnabled(False)
+        try:
+            # Clear out any previous configurable items, letting Qt delete the whole container at once
+            if self.configurablesHost is not None:
+                self.w.gl_setup_configurables.removeWidget(self.configurablesHost)
+                self.configurablesHost.deleteLater()
+
+            self.configurablesHost = QWidget()
+            layout = QGridLayout(self.configurablesHost)
+            layout.setContentsMargins(0, 0, 0, 0)
+
+            # Keep the row spacing set on the form's layout in Designer
+            layout.setHorizontalSpacing(self.w.gl_setup_configurables.horizontalSpacing())
+            layout.setVerticalSpacing(self.w.gl_setup_configurables.verticalSpacing())
+            self.w.gl_setup_configurables.addWidget(self.configurablesHost, 0, 0)
+
+            # Build the GUI elements for the configurables, keeping the value labels so they can be updated individually
+            self.configurableLabels = dict()
+            font = QFont(PHILLER_FONT, 18) # Shared by every row
+            for index, cfg in enumerate(Configuration.CFG):
+                value, units, displayname, _ = self.config.get(cfg)
+
+                displayname_label = QLabel(displayname)
+                displayname_label.setFont(font)
+                displayname_label.setWordWrap(True)
+
+                value_label = QLabel(f'{value} {units}')
+                value_label.setFont(font)
+                value_label.setStyleSheet('color: blue')
+                self.configurableLabels[cfg] = value_label
+
+                update_button = QPushButton('UPDATE')
+                update_button.setFont(font)
+
+                """Bind the cfg parameter late because of:
+                https://stackoverflow.com/questions/19837486/lambda-in-a-loop
+                """
+                update_button.clicked.connect(functools.partial(self.changeConfigurable, cfg))
+
+                layout.addWidget(displayname_label, index, 0)
+                layout.addWidget(value_label, index, 1)
+                layout.addWidget(update_button, index, 2)
+
+            # Finish off with a spacer that pushes everything up to the top
+            verticalSpacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+            layout.addItem(verticalSpacer)
+        finally:
+            panel.setUpdatesEnabled(True)
 
     def changeConfigurable(self, configurable):
         """Change the value of a configuration item based on a user input"""
@@ -1053,7 +1245,7 @@ class MainWindow(QtWidgets.QMainWindow):
         # Test the return from the message box
         newval = None
         returnvalue = msgbox.exec()
-        if returnvalue in [QMessageBox.Ok, QMessageBox.Yes]:
+        if returnvalue in (QMessageBox.Ok, QMessageBox.Yes):
 
             # Make sure the new value is of the right type
             val = le.text()
@@ -1063,47 +1255,71 @@ class MainWindow(QtWidgets.QMainWindow):
                 showDialog(f'Unable to convert "{val}" to type {itemtype.__name__}!')
                 return
 
-        # Update the value in the INI file
-        self.config.set(configurable, newval, save=True)
+        # Nothing to change if the user cancelled
+        if newval is None:
+            return
+
+        # Update the value now, and write the INI file in the background
+        self.config.set(configurable, newval, save=False)
+        self.saveConfig.emit()
+
+        # Update the value shown on screen, only the one row has changed
+        value, units, _, _ = self.config.get(configurable)
+        self.configurableLabels[configurable].setText(f'{value} {units}')
+        if configurable == CFG.DISPLAY_PRESSURE:
+            self.updatePressureScale()
 
-        # Update the values shown on screen
-        self.setupConfigurables()
+    @pyqtSlot()
+    def stopConfigThread(self):
+        """Stop the config thread, and make sure nothing is left unsaved on the way out"""
+        self.configThread.quit()
+        self.configThread.wait()
+        self.config.save()
+
+    def updatePressureScale(self):
+        """Set the max pressure scale, from the config"""
+        self.w.pb_pressure.setMaximum(round(self.config.getValue(CFG.DISPLAY_PRESSURE)))
 
     def selectPanel(self, panel):
         """Select one of the stacked main panels"""
+
+        # Most sessions never visit setup, so only build its widgets when needed
+        if panel == PAGES.SETUP and self.configurablesHost is None:
+            self.setupConfigurables()
+
         self.w.sw_pages.setCurrentIndex(panel.value)
 
+    @pyqtSlot()
     def updateStatus(self):
         """Update the widgets on the status pane"""
-        self.l_state.setText(self.seq.stateName)
-        self.l_message.setText('')
-
-        if self.filler.connected:
-            self.l_connected.setText('CONNECTED')
-            self.l_connected.setStyleSheet('color: green')
+        # Only update the connection label when the connection state changes
+        status = self.fillerStatus
+        connected = status.connected
+        if self.statusChanged('connected', connected):
+            self.l_connected.setText(CONNECTION_TEXT[connected])
+            self.l_connected.setPalette(self.connectionPalettes[connected])
+
+        # Update the widgets that display values from the filler device, only touching the ones whose value changed
+        weight_val = status.weight
+        pressure_val = status.pressure
+        fillswitch = status.fillswitch
+        stopswitch = status.stopswitch
 
-        else:
-            self.l_connected.setText('DISCONNECTED')
-            self.l_connected.setStyleSheet('color: red')
+        # Diagnostics page
+        if self.statusChanged('weight', weight_val):
+            self.w.l_diag_weight_value.setText(f'{weight_val:03.2f} g')
 
-        # Update the widgets that display values from the filler device
-        weight_val = self.filler.weight
-        pressure_val = self.filler.pressure
-        fill_switch_val = ['OFF', 'ON'][self.filler.fillswitch]
-        stop_switch_val = ['OFF', 'ON'][self.filler.stopswitch]
+        if self.statusChanged('pressure', pressure_val):
+            self.w.l_diag_pressure_value.setText(f'{pressure_val:03.1f} psi')
 
-        # Diagnostics page
-        self.w.l_diag_weight_value.setText(f'{weight_val:03.2f} g')
-        self.w.l_diag_pressure_value.setText(f'{pressure_val:03.1f} psi')
-        self.w.l_diag_fill_switch.setText(fill_switch_val)
-        self.w.l_diag_stop_switch.setText(stop_switch_val)
+            # Display the pressure value as a progress bar
+            self.w.pb_pressure.setValue(round(pressure_val))
 
-        # Display the pressure value as a progress bar
-        self.w.pb_pressure.setValue(round(pressure_val))
+        if self.statusChanged('fillswitch', fillswitch):
+            self.w.l_diag_fill_switch.setText(ONOFF[fillswitch])
 
-        # Update the max pressure scale
-        max = self.config.getValue(CFG.DISPLAY_PRESSURE)
-        self.w.pb_pressure.setMaximum(round(max))
+        if self.statusChanged('stopswitch', stopswitch):
+            self.w.l_diag_stop_switch.setText(ONOFF[stopswitch])
 
         # Clean page
 
@@ -1111,25 +1327,62 @@ class MainWindow(QtWidgets.QMainWindow):
         styleOn = 'color: rgb(0, 0, 255); border: 20px solid rgb(255, 255, 127);'
         styleOff = 'color: rgb(0, 0, 255); border: 20px solid rgba(128, 128, 128, 64);'
 
-        # Set the button backgrounds based on the valve states
-        if self.filler.pressureSwitch:
-            self.w.b_clean_pressure_on.setStyleSheet(styleOn)
-            self.w.b_clean_pressure_off.setStyleSheet(styleOff)
-        else:
-            self.w.b_clean_pressure_on.setStyleSheet(styleOff)
-            self.w.b_clean_pressure_off.setStyleSheet(styleOn)
-
-        if self.filler.dispenseSwitch:
-            self.w.b_clean_dispense_on.setStyleSheet(styleOn)
-            self.w.b_clean_dispense_off.setStyleSheet(styleOff)
-        else:
-            self.w.b_clean_dispense_on.setStyleSheet(styleOff)
-            self.w.b_clean_dispense_off.setStyleSheet(styleOn)
-
+        # Set the button backgrounds based on the valve states (restyling is expensive, so only when they change)
+        pressureSwitch = status.pressureSwitch
+        if self.statusChanged('pressureSwitch', pressureSwitch):
+            if pressureSwitch:
+                self.w.b_clean_pressure_on.setStyleSheet(styleOn)
+                self.w.b_clean_pressure_off.setStyleSheet(styleOff)
+            else:
+                self.w.b_clean_pressure_on.setStyleSheet(styleOff)
+                self.w.b_clean_pressure_off.setStyleSheet(styleOn)
+
+        dispenseSwitch = status.dispenseSwitch
+        if self.statusChanged('dispenseSwitch', dispenseSwitch):
+            if dispenseSwitch:
+                self.w.b_clean_dispense_on.setStyleSheet(styleOn)
+                self.w.b_clean_dispense_off.setStyleSheet(styleOff)
+            else:
+                self.w.b_clean_dispense_on.setStyleSheet(styleOff)
+                self.w.b_clean_dispense_off.setStyleSheet(styleOn)
+
+    @pyqtSlot(object)
+    def setFillerStatus(self, status):
+        """Store the latest status from the filler device, and show it"""
+        self.fillerStatus = status
+        self.fillerStatusTime = time.monotonic()
+
+        # Show the first change straight away, then any later ones in a single update when the throttle expires
+        if not self.statusThrottle.isActive():
+            self.updateStatus()
+            self.statusThrottle.start()
+
+    @pyqtSlot()
+    def checkFillerStatus(self):
+        """Show the filler as disconnected if its status has stopped arriving"""
+        if self.fillerStatus.connected and (time.monotonic() - self.fillerStatusTime) > STATUS_STALE:
+            self.fillerStatus = self.fillerStatus._replace(connected=False)
+            self.updateStatus()
+
+    def statusChanged(self, name, value):
+        """
+        Track the last value displayed for a status item.
 
+        :param name: The name of the status item.
+        :param value: Its current value.
+        :return: True if the value is different from the last one displayed, so the widget needs updating.
+        """
+        if name in self.lastStatus and self.lastStatus[name] == value:
+            return False
 
+        self.lastStatus[name] = value
+        return True
 
+    @pyqtSlot()
     def play(self):
+        # Only pull in the multimedia module when a sound is actually played, it's slow to load on the Pi
+        from PyQt5 import QtMultimedia
+
         x = random.random()
 
         if x > 0.5:
@@ -1137,132 +1390,92 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             QtMultimedia.QSound.play('agogo.wav')
 
+    @pyqtSlot(int)
+    def updateState(self, value):
+        """Update the screen to match the state the state machine changed to"""
+        states = self.states
+
+        # Use the state sent with the signal, as the state machine may have moved on again by the time this runs
+        state = self.seq.stateList[value]
 
-    def updateState(self):
-        """Update the screen to match the state machine"""
-        states = self.seq.STATES
-        fillStates = [state for state in range(states.FILL_PREP1, states.FILL_TERMINATE)]
+        # Show the state name on the status bar
+        self.l_state.setText(state.name)
 
         # Set the right panel
-        if self.seq.state in [states.STANDBY]:
+        if state == states.STANDBY:
             self.selectPanel(PAGES.MAIN)
 
-        elif self.seq.state in [states.DIAGNOSTICS]:
+        elif state == states.DIAGNOSTICS:
             self.selectPanel(PAGES.DIAG)
 
-        elif self.seq.state in [states.SETUP]:
+        elif state == states.SETUP:
             self.selectPanel(PAGES.SETUP)
 
-        elif self.seq.state in fillStates:
+        elif state in self.seq.FILL_STATES:
             self.selectPanel(PAGES.FILL)
-            message, enable = self.seq.message
-            self.w.b_fill_next.setText(message)
-            self.w.b_fill_next.setEnabled(enable)
 
-        elif self.seq.state in [states.CLEAN]:
+        elif state == states.CLEAN:
             self.selectPanel(PAGES.CLEAN)
 
+    @pyqtSlot(str, bool)
+    def updateMessage(self, message, enable):
+        """Show the sequencer message on the fill panel"""
+        self.w.b_fill_next.setText(message)
+        self.w.b_fill_next.setEnabled(enable)
 
-    def buttonClicked(self):
-        """Handle button clicks"""
-        success = True
-        message = ''
-
-        buttons = self.seq.BUTTONS
-
-        # Which button originated the click?
-        origin = self.sender()
-
-        # Fill related buttons
-        if origin == self.w.b_main_fill_bottles:
-            self.seq.request(buttons.MAIN_ENTER_FILL)
-
-        elif origin == self.w.b_fill_back:
-            self.seq.request(buttons.EXIT)
-
-        elif origin == self.w.b_fill_next:
-            self.seq.request(buttons.FILL_NEXT)
-
-        # Clean related buttons
-        elif origin == self.w.b_main_clean_system:
-            self.seq.request(buttons.MAIN_ENTER_CLEAN)
-
-        elif origin == self.w.b_clean_back:
-            self.seq.request(buttons.EXIT)
-
-        elif origin == self.w.b_clean_pressure_on:
-            self.seq.request(buttons.CLEAN_PRESSURE_ON)
-
-        elif origin == self.w.b_clean_pressure_off:
-            self.seq.request(buttons.CLEAN_PRESSURE_OFF)
-
-        elif origin == self.w.b_clean_dispense_on:
-            self.seq.request(buttons.CLEAN_DISPENSE_ON)
-
-        elif origin == self.w.b_clean_dispense_off:
-            self.seq.request(buttons.CLEAN_DISPENSE_OFF)
-
-        # Diagnostics related buttons
-        elif origin == self.w.b_diag_back:
-            self.seq.request(buttons.EXIT)
-
-        elif origin == self.w.b_diag_pressure_on:
-            self.seq.request(buttons.DIAG_PRESSURE_ON)
-
-        elif origin == self.w.b_diag_pressure_off:
-            self.seq.request(buttons.DIAG_PRESSURE_OFF)
-
-        elif origin == self.w.b_diag_dispense:
-            try:
-                text = self.w.le_diag_dispense_time.text()
-                self.seq.diagDispense = int(text)
-            except:
-                showDialog(f'Text: "{text}" not a valid integer!')
-
-            self.seq.request(buttons.DIAG_DISPENSE)
-
-        elif origin == self.w.b_diag_setup:
-            self.seq.request(buttons.DIAG_SETUP)
-
-        elif origin == self.w.b_diag_sound_test:
-            self.play()
-
-        # Setup related buttons
-        elif origin == self.w.b_setup_back:
-            self.seq.request(buttons.EXIT)
-
-        # Simulated I/O buttons
-        elif origin == self.b_fill_switch_simulate:
-            self.filler.simulateFillswitch(True)
-
-        elif origin == self.b_stop_switch_simulate:
+    @pyqtSlot()
+    def requestDiagDispense(self):
+        """Dispense for the time entered on the diagnostics page"""
+        try:
+            text = self.w.le_diag_dispense_time.text()
+            self.seq.diagDispense = int(text)
+        except:
+            showDialog(f'Text: "{text}" not a valid integer!')
 
-            # Invert the switch state
-            self.filler.simulateStopSwitch(toggle=True)
+        self.seq.request(self.buttons.DIAG_DISPENSE)
 
-            if self.filler.stopswitch:
-                self.b_stop_switch_simulate.setStyleSheet('background-color: blue')
-            else:
-                self.b_stop_switch_simulate.setStyleSheet('')
+    def requestButton(self, button, checked=False):
+        """
+        Pass a button press on to the sequencer.
 
-        elif origin == self.b_pressure_simulate:
-            # Prompt the user for a new pressure value
-            v = self.promptValue()
-            self.filler.simulatePressure(v)
+        :param button: The sequencer BUTTONS value for the press.
+        :param checked: The checked state sent by the clicked/triggered signal, unused.
+        :return: Nothing.
+        """
+        self.seq.request(button)
 
-        elif origin == self.b_weight_simulate:
-            # Prompt the user for a new weight value
-            v = self.promptValue()
-            self.filler.simulateWeight(v)
+    @pyqtSlot()
+    def pressSimulatedFillSwitch(self):
+        """Latch a simulated fill switch press"""
+        self.filler.simulateFillswitch(True)
 
-        elif origin == self.b_stable_simulate:
-            # Toggle the simulation of stable weight
-            state = self.filler.simulatedStable
-            self.filler.simulateStable(not state)
+    @pyqtSlot()
+    def toggleSimulatedStopSwitch(self):
+        """Invert the simulated stop switch state"""
+        self.filler.simulateStopSwitch(toggle=True)
 
-        # Display the failure text
-        if not success:
-            self.l_message.setText(message)
+        if self.filler.stopswitch:
+            self.b_stop_switch_simulate.setStyleSheet('background-color: blue')
+        else:
+            self.b_stop_switch_simulate.setStyleSheet('')
+
+    @pyqtSlot()
+    def promptSimulatedPressure(self):
+        """Prompt the user for a new pressure value"""
+        v = self.promptValue()
+        self.filler.simulatePressure(v)
+
+    @pyqtSlot()
+    def promptSimulatedWeight(self):
+        """Prompt the user for a new weight value"""
+        v = self.promptValue()
+        self.filler.simulateWeight(v)
+
+    @pyqtSlot()
+    def toggleSimulatedStable(self):
+        """Toggle the simulation of stable weight"""
+        state = self.filler.simulatedStable
+        self.filler.simulateStable(not state)
 
     def promptValue(self):
         """Prompt the user for a value, used to override pressure/weight"""
@@ -1287,7 +1500,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Test the return from the message box
         returnvalue = msgbox.exec()
-        if returnvalue in [QMessageBox.Ok, QMessageBox.Yes]:
+        if returnvalue in (QMessageBox.Ok, QMessageBox.Yes):
             try:
                 v = float(le.text())
             except:
@@ -1326,6 +1539,9 @@ if __name__ == '__main__':
     window = MainWindow()
     app.exec_()
 
+    # Flush anything still queued for the log
+    logListener.stop()
+
 
 
 